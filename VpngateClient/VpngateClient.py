@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 import argparse
 import base64
-import concurrent.futures
 import csv
 import ctypes
+import itertools
 import logging
 import os
 import platform
@@ -11,9 +11,10 @@ import re
 import shutil
 import signal
 import socket
-import ssl
+import sqlite3
 import subprocess
 import sys
+import threading
 import time
 import urllib.error
 import urllib.request
@@ -23,13 +24,71 @@ from datetime import datetime, timedelta
 if __name__ == "__main__":
     # 绝对导入用于脚本运行
     from module_connectivity import check_connectivity as module_check_connectivity
+    from module_candidates import CandidateQueue
+    from module_config import CONFIG_POOL
+    from module_download import (
+        ListCache,
+        ListDownload,
+        ListSource,
+        ListSourceRacer,
+        MirrorTable,
+        ProxyDiscovery,
+    )
     from module_firewall import FirewallManager, IPv4_COMMANDS, IPv6_COMMANDS
+    from module_http import get_http_client
+    from module_probe import (
+        DEFAULT_PROBE_CONCURRENCY,
+        ProbeEngine,
+        ProbeResult,
+    )
+    from module_rank import RankModel, parse_rank_weights
+    from module_store import (
+        SOURCE_MAIN,
+        SOURCE_HISTORY,
+        SOURCE_QUALIFIED,
+        AttemptHistory,
+        ListSnapshot,
+        ProbeCache,
+        QualifiedStore,
+        ServerHistory,
+        ServerIndex,
+        ServerRecord,
+    )
     from module_translations import get_text
     from user_data_manager import UserDataManager
 else:
     # 相对导入用于模块导入
     from .module_connectivity import check_connectivity as module_check_connectivity
+    from .module_candidates import CandidateQueue
+    from .module_config import CONFIG_POOL
+    from .module_download import (
+        ListCache,
+        ListDownload,
+        ListSource,
+        ListSourceRacer,
+        MirrorTable,
+        ProxyDiscovery,
+    )
     from .module_firewall import FirewallManager, IPv4_COMMANDS, IPv6_COMMANDS
+    from .module_http import get_http_client
+    from .module_probe import (
+        DEFAULT_PROBE_CONCURRENCY,
+        ProbeEngine,
+        ProbeResult,
+    )
+    from .module_rank import RankModel, parse_rank_weights
+    from .module_store import (
+        SOURCE_MAIN,
+        SOURCE_HISTORY,
+        SOURCE_QUALIFIED,
+        AttemptHistory,
+        ListSnapshot,
+        ProbeCache,
+        QualifiedStore,
+        ServerHistory,
+        ServerIndex,
+        ServerRecord,
+    )
     from .module_translations import get_text
     from .user_data_manager import UserDataManager
 
@@ -40,15 +99,44 @@ is_windows = platform.system() == "Windows"
 
 # The URL for the VPN list
 VPN_LIST_URL = "https://www.vpngate.net/api/iphone/"
+# GitHub mirror of the VPN list, used when the main URL is unavailable
+BACKUP_LIST_URL = "https://raw.githubusercontent.com/sinspired/VpngateAPI/main/servers.csv"
+# GitHub proxies that can serve BACKUP_LIST_URL
+GITHUB_PROXIES = [
+    "https://ghproxy.net/",
+    "https://gh.llkk.cc/",
+    "https://ghp.ci/",
+    "https://ghproxy.cn/",
+    "https://github.akams.cn/",
+]
+DEFAULT_HEDGE_DELAY = 0.3  # second
 # SPEED_TEST_URL = "http://ipv4.download.thinkbroadband.com/50MB.zip"
 # SPEED_TEST_URL = "https://cachefly.cachefly.net/50mb.test"
 SPEED_TEST_URL = "https://github.com/VSCodium/vscodium-insiders/releases/download/1.101.03607-insider/VSCodium-linux-x64-1.101.03607-insider.tar.gz"
 LOCAL_CSV_NAME = "servers.csv"
+MIRROR_TABLE_NAME = "mirrors.json"
+PROXY_CACHE_NAME = "proxy.json"
+HISTORY_CSV_NAME = "servers_history.csv"
+SNAPSHOT_NAME = "servers.snapshot"
+PROBE_CACHE_NAME = "probe_cache.sqlite3"
+ATTEMPT_HISTORY_NAME = "attempt_history.sqlite3"
+QUALIFIED_STORE_NAME = "qualified_vpns.sqlite3"
+# Pre-store qualified list, imported into the store once
+QUALIFIED_CSV_NAME = "qualified_vpns.csv"
 DEFAULT_EXPIRED_TIME = 0.15  # hours
+DEFAULT_STALE_MAX_AGE = 24  # hours
+DEFAULT_HISTORY_MAX_AGE = 7  # days
 DEFAULT_MIN_SPEED = 0.00  # MB/s
 SET_UDP_LATENCY = 60  # ms millisecond
 DEFAULT_QUALIFIED_TIME = 5  # minutes
 DEFAULT_VPN_TIMEOUT = 9 if is_windows else 4  # second
+DEFAULT_PROBE_TOP = 100  # pre-ranked main list VPNs probed per tier, 0 = all
+DEFAULT_PROBE_SAMPLES = 1  # latency samples per responding VPN
+DEFAULT_EARLY_START = 3  # fast responders before connecting, 0 = full sweep
+DEFAULT_LATENCY_BUDGET = 300  # ms, latency of a fast responder
+DEFAULT_PROBE_CACHE_TTL = 10  # minutes a responding probe result stays valid
+DEFAULT_HEDGE_POOL = 0  # responders a two-pass probe sweep aims for, 0 = one pass
+QUALIFIED_RELIABILITY = 0.5  # reliability of a qualified VPN without attempt history
 
 # The app running with temp\cahe\config DIRs,automatic with promission and exists
 APP_RUNNING_DIR = UserDataManager("VpngateClient")
@@ -80,10 +168,24 @@ def check_connectivity(timeout=5):
     )
 
 
+def open_qualified_store():
+    """The qualified server store in CONFIG_DIR (imports a legacy CSV once)."""
+    return QualifiedStore(
+        os.path.join(CONFIG_DIR, QUALIFIED_STORE_NAME),
+        os.path.join(CONFIG_DIR, QUALIFIED_CSV_NAME),
+        logger,
+    )
+
+
+def open_attempt_history():
+    """The per-endpoint connection attempt history in CONFIG_DIR."""
+    return AttemptHistory(os.path.join(CONFIG_DIR, ATTEMPT_HISTORY_NAME), logger)
+
+
 class VPNClient:
     """A VPN Client Manager."""
 
-    def __init__(self, data, args):
+    def __init__(self, data, args, config=None):
         # Command Line Arguments
         self.args = args
 
@@ -108,28 +210,33 @@ class VPNClient:
         self.proto = None
         self.port = None
 
-        # OpenVPN Config
-        conf = data.get("OpenVPN_ConfigData_Base64", "")
-        if not conf:
-            self.log.error(get_text("Missing OpenVPN config data."))
-            raise ValueError(
-                get_text("Missing OpenVPN config data.")
-            )  # Or handle appropriately
-        try:
-            self.config = base64.b64decode(conf).decode("UTF-8")
-        except (base64.binascii.Error, UnicodeDecodeError) as e:
-            self.log.error(get_text("Failed to decode Base64 config: %s") % e)
-            raise ValueError(get_text("Invalid Base64 config: %s") % e) from e
+        # OpenVPN Config, either already split (from a ServerRecord) or Base64 encoded
+        if config is None:
+            conf = data.get("OpenVPN_ConfigData_Base64", "")
+            if not conf:
+                self.log.error(get_text("Missing OpenVPN config data."))
+                raise ValueError(
+                    get_text("Missing OpenVPN config data.")
+                )  # Or handle appropriately
+            try:
+                config = CONFIG_POOL.compact(base64.b64decode(conf).decode("UTF-8"))
+            except (base64.binascii.Error, UnicodeDecodeError) as e:
+                self.log.error(get_text("Failed to decode Base64 config: %s") % e)
+                raise ValueError(get_text("Invalid Base64 config: %s") % e) from e
+        # Shared blocks (<ca>, <cert>, <key>...) are interned in CONFIG_POOL;
+        # the full text is only rebuilt when a config file is written
+        self.compact_config = config
 
         # Instance variable to track if saved as qualified
         self.saved_as_qualified = False
         # Instance variable to store the qualified config file path once determined
         self.qualified_vpn_config_path = None
-        self.qualified_vpn_csv_path = None
-
-        self.udp_latency = getattr(args, "udp_latency", SET_UDP_LATENCY)
+        self.qualified_store = None
+        # Outcome of the current connection attempt, recorded in the attempt history
+        self.attempt = {}
 
-        for line in self.config.splitlines():
+        # The per-server lines of the compact config are the remote / proto lines
+        for line in self.compact_config.lines:
             parts = line.split()
             if line.startswith("remote") and len(parts) == 3:
                 # format: remote <ip> <port>
@@ -185,57 +292,20 @@ class VPNClient:
                 CONFIG_DIR,
                 f"{self.country_code}_{self.ip}_{self.port}_{self.proto}.ovpn",
             )
-            self.qualified_vpn_csv_path = os.path.join(CONFIG_DIR, "qualified_vpns.csv")
+            self.qualified_store = open_qualified_store()
 
         # Initialize FirewallManager
         self.firewall = FirewallManager(self.ip, IPv4_COMMANDS, IPv6_COMMANDS)
 
-    def is_listening(self):
-        """Probes the VPN endpoint to see if it's listening and measures latency."""
-        if not self.ip or not self.port:
-            self.log.error(get_text("Cannot probe VPN without IP and Port."))
-            return False, float("inf")  # Return infinite latency if invalid
+    @classmethod
+    def from_record(cls, record, args):
+        """Builds the full client for a server record we are about to connect to."""
+        return cls(record.as_row(), args, config=record.config)
 
-        if self.proto == "udp":
-            udp_latency = self.udp_latency
-            self.log.debug(get_text("cant_probe_udp"), udp_latency)
-            return True, float(
-                udp_latency
-            )  # UDP probing not implemented, return low latency, because UDP connect make better performance
-
-        self.log.debug(get_text("probing_vpn"))
-
-        # Create a socket with a timeout.
-        s = socket.socket()
-        s.settimeout(self.args.probe_timeout)
-
-        try:
-            # Measure start time
-            start_time = time.time()
-
-            # Try to connect to the VPN endpoint.
-            s.connect((self.ip, int(self.port)))  # Ensure port is int
-            s.shutdown(socket.SHUT_RDWR)
-
-            # Measure end time and calculate latency
-            latency = (time.time() - start_time) * 1000
-            self.log.debug(get_text("vpn_listening"), f"{latency:.0f} ms")
-            return True, latency
-        except socket.timeout:
-            self.log.debug(get_text("vpn_not_responding"))
-            return False, float("inf")
-        except (
-            ConnectionRefusedError,
-            OSError,
-            socket.gaierror,
-        ) as e:
-            self.log.debug(f"{get_text('connection_failed')}: {e}")
-            return False, float("inf")
-        except Exception as e:
-            self.log.exception(get_text("Unexpected error during probing: %s") % e)
-            return False, float("inf")
-        finally:
-            s.close()  # Ensure socket is closed
+    @property
+    def config(self):
+        """The full OpenVPN config text, rebuilt from the compact config."""
+        return self.compact_config.text()
 
     def connect(self):
         """Initiates and manages the connection to this VPN server.
@@ -252,6 +322,7 @@ class VPNClient:
             self.log.error(get_text("Cannot connect: Missing IP, Port, or Protocol."))
             return False
         self.log.debug(get_text("connecting_to_vpn"))
+        self.attempt = {"started_at": time.time(), "initialized": False}
 
         # --- Config File Setup ---
         config_file_path = os.path.join(
@@ -301,7 +372,9 @@ class VPNClient:
             )
 
             # --- Wait for VPN Initialization ---
+            init_started = time.time()
             if not self.wait_for_vpn_ready(proc, config_file_path):
+                self.attempt["reason"] = "init_failed"
                 # VPN failed to initialize. Error logged in wait_for_vpn_ready.
                 # Terminate and cleanup are handled within wait_for_vpn_ready or its exception handlers
                 # Need to ensure cleanup happens if wait_for_vpn_ready returns False normally
@@ -309,6 +382,10 @@ class VPNClient:
                 self.terminate_vpn(proc)  # Attempt termination if still running
                 self._cleanup_temp_files(config_file_path, status_file_path)
                 return False
+            self.attempt["initialized"] = True
+            self.attempt["init_time"] = time.time() - init_started
+            # Pooled connections were opened on the direct route
+            get_http_client().reset()
 
             # if is_linux and os.path.exists(status_file_path):
             # os.chmod(status_file_path, 0o777)
@@ -320,6 +397,12 @@ class VPNClient:
 
             # 修改：只要vpncheck未通过，直接终止，无需后续等待和提示
             if not speed_result or speed_result == "error":
+                if speed_result == "error":
+                    self.attempt["reason"] = "check_error"
+                elif self.attempt.get("connectivity"):
+                    self.attempt["reason"] = "slow"
+                else:
+                    self.attempt["reason"] = "no_connectivity"
                 self.log.info(get_text("error_download_speed"))
                 self.terminate_vpn(proc)
                 self._cleanup_temp_files(config_file_path, status_file_path)
@@ -328,6 +411,7 @@ class VPNClient:
                 # Speed test或连通性检测通过
                 use_this_vpn = self.prompt_use_vpn()
                 if not use_this_vpn:
+                    self.attempt["reason"] = "rejected"
                     print("\033[33m" + get_text("next_vpn") + "\033[0m")
                     self.terminate_vpn(proc)
                     self._cleanup_temp_files(config_file_path, status_file_path)
@@ -337,6 +421,7 @@ class VPNClient:
             if self.args.iptables and is_linux:
                 self.log.info(get_text("setup_iptables_rules"))
                 if not self.setup_iptables_rules():
+                    self.attempt["reason"] = "firewall"
                     self.log.error(
                         get_text(
                             "Failed to set up firewall rules. Terminating connection."
@@ -361,6 +446,7 @@ class VPNClient:
             return connection_result  # Return status from monitor
 
         except KeyboardInterrupt:
+            self.attempt["reason"] = "interrupted"
             self.log.info(
                 get_text("received_keyboard_interrupt")
                 + " "
@@ -375,6 +461,7 @@ class VPNClient:
             # For now, assume we exit gracefully from here
             sys.exit(0)  # Or return False depending on desired caller behavior
         except Exception as e:
+            self.attempt["reason"] = "error"
             self.log.exception(
                 get_text("An unexpected error occurred during connect: %s") % e
             )
@@ -387,7 +474,21 @@ class VPNClient:
         finally:
             # Final cleanup check, although it should be handled above
             # self._cleanup_temp_files(config_file_path, status_file_path) # Maybe redundant
-            pass
+            if self.attempt.get("initialized"):
+                # The tunnel is down again: drop connections opened through it
+                get_http_client().reset()
+            self._record_attempt()
+
+    def _record_attempt(self):
+        """Stores the outcome of the current attempt in the attempt history."""
+        if not self.attempt or not (self.ip and self.port and self.proto):
+            return
+        try:
+            open_attempt_history().record(
+                (self.ip, self.port, self.proto), self.attempt
+            )
+        except (OSError, sqlite3.Error) as e:
+            self.log.debug(f"Failed to record connection attempt: {e}")
 
     def _cleanup_temp_files(self, config_file, status_file):
         """Safely remove temporary config and status files."""
@@ -550,6 +651,7 @@ class VPNClient:
                     use_this_vpn = self.prompt_use_vpn()
                     require_delayed_prompt = False  # Prompt only once
                     if not use_this_vpn:
+                        self.attempt["reason"] = "rejected"
                         print("\033[90m" + get_text("next_vpn") + "\033[0m")
                         # Terminate, cleanup, and return False from monitor
                         self.terminate_vpn(proc)
@@ -624,104 +726,66 @@ class VPNClient:
                             end="\r",
                         )
 
-                        if self.qualified_vpn_config_path and not os.path.exists(
-                            self.qualified_vpn_config_path
-                        ):
-                            self.log.debug(
-                                get_text("将要保存优质配置到: %s")
-                                % self.qualified_vpn_config_path
-                            )
-                            try:
+                        wrote_config = False
+                        try:
+                            if self.qualified_vpn_config_path and not os.path.exists(
+                                self.qualified_vpn_config_path
+                            ):
+                                self.log.debug(
+                                    get_text("将要保存优质配置到: %s")
+                                    % self.qualified_vpn_config_path
+                                )
                                 with open(
                                     self.qualified_vpn_config_path,
                                     "w",
                                     encoding="utf-8",
                                 ) as f:
                                     f.write(self.config)
+                                wrote_config = True
                                 self.log.debug(
                                     get_text("VPN连接稳定，保存配置到文件\n %s。")
                                     % self.qualified_vpn_config_path
                                 )
-                                if self.qualified_vpn_csv_path:
-                                    vpn_data = {
-                                        "IP": self.ip,
-                                        "Port": self.port,
-                                        "Country": self.country,
-                                        "CountryCode": self.country_code,
-                                        "Protocol": self.proto,
-                                        "ConfigBase64": base64.b64encode(
-                                            self.config.encode("utf-8")
-                                        ).decode("utf-8"),
-                                    }
-                                    file_exists = os.path.exists(
-                                        self.qualified_vpn_csv_path
-                                    )
-                                    with open(
-                                        self.qualified_vpn_csv_path,
-                                        mode="a",
-                                        newline="",
-                                        encoding="utf-8",
-                                    ) as csvfile:
-                                        fieldnames = [
-                                            "IP",
-                                            "Port",
-                                            "Country",
-                                            "CountryCode",
-                                            "Protocol",
-                                            "ConfigBase64",
-                                        ]
-                                        writer = csv.DictWriter(
-                                            csvfile, fieldnames=fieldnames
-                                        )
-                                        if (
-                                            not file_exists
-                                            or os.path.getsize(
-                                                self.qualified_vpn_csv_path
-                                            )
-                                            == 0
-                                        ):
-                                            writer.writeheader()
-                                        writer.writerow(vpn_data)
-                                    print(
-                                        get_text(
-                                            "VPN Connected stable in n minutes, save VPN config in CSV file"
-                                        )
-                                        % (
-                                            self.args.qualified_time,
-                                            self.qualified_vpn_csv_path,
-                                        )
+                            elif self.qualified_vpn_config_path:
+                                print(
+                                    get_text(
+                                        "Qualified config file already exists. Skipping save."
                                     )
-                                self.saved_as_qualified = True
-                            except (IOError, OSError, csv.Error) as e:
-                                self.log.error(
-                                    get_text("Failed to save qualified VPN info: %s")
-                                    % e
+                                    % (self.qualified_vpn_config_path),
+                                    end="\r",
+                                )
+                            if self.qualified_store is not None:
+                                # Counts every qualification; the server is stored once
+                                self.qualified_store.qualify(
+                                    (self.ip, self.port, self.proto),
+                                    self.country,
+                                    self.country_code,
+                                    base64.b64encode(self.config.encode("utf-8")),
                                 )
-                                if os.path.exists(self.qualified_vpn_config_path):
-                                    try:
-                                        os.remove(self.qualified_vpn_config_path)
-                                    except OSError:
-                                        pass
-                            except Exception as e:
-                                self.log.exception(
+                                print(
                                     get_text(
-                                        "Unexpected error saving qualified VPN: %s"
+                                        "VPN Connected stable in n minutes, save VPN config in CSV file"
+                                    )
+                                    % (
+                                        self.args.qualified_time,
+                                        self.qualified_store.path,
                                     )
-                                    % e
                                 )
-                        elif self.saved_as_qualified:
-                            self.log.debug(
-                                get_text("Already saved as qualified during this run.")
+                            self.saved_as_qualified = True
+                        except (IOError, OSError, sqlite3.Error) as e:
+                            self.log.error(
+                                get_text("Failed to save qualified VPN info: %s") % e
                             )
-                        else:
-                            print(
-                                get_text(
-                                    "Qualified config file already exists. Skipping save."
-                                )
-                                % (self.qualified_vpn_config_path),
-                                end="\r",
+                            if wrote_config:
+                                try:
+                                    os.remove(self.qualified_vpn_config_path)
+                                except OSError:
+                                    pass
+                        except Exception as e:
+                            self.log.exception(
+                                get_text("Unexpected error saving qualified VPN: %s")
+                                % e
                             )
-                            self.saved_as_qualified = True
 
                 # 新增：15秒无数据变动时进行连通性检测
                 if no_data_seconds >= 15:
@@ -730,6 +794,7 @@ class VPNClient:
                         end="\r",
                     )
                     if not check_connectivity():
+                        self.attempt["reason"] = "connectivity_lost"
                         print("\033[31m\n- VPN连通性检测失败，判定VPN已断开。\033[0m")
                         self.terminate_vpn(proc)
                         self._cleanup_temp_files(config_file_path, status_file_path)
@@ -746,6 +811,7 @@ class VPNClient:
 
                 # Check for disconnect condition (too many intervals with no change)
                 if no_change_counter >= max_retries:
+                    self.attempt["reason"] = "stalled"
                     print()  # Newline after status print
                     self.log.warning(
                         get_text("connection_disconnected")
@@ -760,6 +826,7 @@ class VPNClient:
 
                 # Check if the OpenVPN process itself has exited unexpectedly
                 if proc.poll() is not None:
+                    self.attempt["reason"] = "process_exited"
                     print()  # Newline after status print
                     self.log.error(
                         "\033[31m"
@@ -776,6 +843,7 @@ class VPNClient:
                 previous_stats = current_stats
 
         except KeyboardInterrupt:
+            self.attempt["reason"] = "stopped"
             print()  # Newline after status print
             self.log.info(get_text("received_keyboard_interrupt"))
             self.terminate_vpn(proc)
@@ -785,6 +853,7 @@ class VPNClient:
             return False  # Modified: Indicate user interruption to caller
 
         except (IOError, OSError) as e:
+            self.attempt["reason"] = "error"
             print()  # Newline after status print
             self.log.error(get_text("I/O Error during monitoring: %s") % e)
             self.terminate_vpn(proc)
@@ -794,6 +863,7 @@ class VPNClient:
             return False  # Indicate failure
 
         except Exception as e:
+            self.attempt["reason"] = "error"
             print()  # Newline after status print
             self.log.exception(
                 get_text("An unexpected error occurred during vpn_monitor: %s") % e
@@ -806,6 +876,16 @@ class VPNClient:
 
         finally:
             # print()  # Ensure newline after last status update or error message
+            self.attempt["duration"] = time.time() - start_time
+            # Keyed on the endpoint alone: a stored server counts even when this
+            # session ends before it qualifies again
+            if self.qualified_store is not None:
+                try:
+                    self.qualified_store.add_uptime(
+                        (self.ip, self.port, self.proto), time.time() - start_time
+                    )
+                except sqlite3.Error as e:
+                    self.log.debug(f"Failed to record uptime: {e}")
             self.log.info(
                 get_text("connection_closed") % (self.ip, self.port, self.country_code)
             )
@@ -1172,12 +1252,15 @@ class VPNClient:
         try:
             # 先进行连通性检测
             print("\r" + get_text("performing_connect_test"), end="\r")
-            if check_connectivity():
+            connected = bool(check_connectivity())
+            self.attempt["connectivity"] = connected
+            if connected:
                 print("\033[32m连通性检测通过，VPN可用。\033[0m", end="\r")
                 # 连通性通过后再测速
                 print("\r" + get_text("performing_speedtest"), end="\r")
                 download_speed_MBps = speedtest()
                 if download_speed_MBps is not None and download_speed_MBps != "error":
+                    self.attempt["speed"] = download_speed_MBps
                     if download_speed_MBps >= self.args.min_speed:
                         return True
                     else:
@@ -1285,24 +1368,135 @@ class VPNList:
         # Initialize separate lists
         self.qualified_vpns = []
         self.main_vpns = []
+        # Columnar index of every loaded server; the two lists above are views of it
+        self.index = ServerIndex()
+        # Guards the lists and the index while a background refresh merges new servers
+        self.lock = threading.Lock()
+        # Endpoints already probed, so a background refresh only probes new ones
+        self.probed_endpoints = set()
+        # Pre-ranking of the main list: only the top tier is probed up front,
+        # the rest is probed tier by tier once the connect loop runs out
+        self.rank_model = RankModel(getattr(self.args, "rank_weights", None))
+        self.probe_top = max(0, getattr(self.args, "probe_top", DEFAULT_PROBE_TOP))
+        self.deferred_vpns = []
+        self.probe_engine = ProbeEngine(
+            self.args.probe_timeout,
+            concurrency=self.args.probes,
+            udp_latency=getattr(self.args, "udp_latency", SET_UDP_LATENCY),
+            deep_tcp=getattr(self.args, "deep_probe", False),
+            samples=getattr(self.args, "probe_samples", DEFAULT_PROBE_SAMPLES),
+            adaptive=not getattr(self.args, "fixed_probes", False),
+            hedge_target=getattr(self.args, "hedge_pool", DEFAULT_HEDGE_POOL),
+            logger=self.log,
+        )
+        # Recent probe results, so a quick restart only probes what is uncertain
+        self.probe_cache = ProbeCache(
+            os.path.join(CACHE_DIR, PROBE_CACHE_NAME),
+            getattr(self.args, "probe_cache_ttl", DEFAULT_PROBE_CACHE_TTL) * 60,
+            self.log,
+        )
+        try:
+            self.probe_cache.load()
+        except sqlite3.Error as e:
+            self.log.debug(f"Ignoring probe cache: {e}")
+        # Reliability learned from past connection attempts, which orders the
+        # candidates of both lists together with the probed latency
+        try:
+            self.reliability = open_attempt_history().scores()
+        except sqlite3.Error as e:
+            self.log.debug(f"Ignoring attempt history: {e}")
+            self.reliability = {}
+        self.initial_probe_done = threading.Event()
+        # Cleared while a list download runs; no attempt starts before it is set
+        self.list_downloaded = threading.Event()
+        self.list_downloaded.set()
+        self.refresh_thread = None
+        self.probe_thread = None
+        # Responding servers, best first, handed to the connect loop as they arrive
+        self.candidates = CandidateQueue(
+            min_ready=max(0, getattr(self.args, "early_start", DEFAULT_EARLY_START)),
+            latency_budget=getattr(
+                self.args, "latency_budget", DEFAULT_LATENCY_BUDGET
+            ),
+            sort_latency=not getattr(self.args, "no_sort_latency", False),
+        )
+
+        # Geographic filter shared by the cached and the streamed lists
+        self.country_filter = self._build_country_filter()
 
         # --- Loading ---
         # Check if the main list CSV file exists and is not expired
         self.local_csv_path = os.path.join(CACHE_DIR, LOCAL_CSV_NAME)
+        self.list_cache = ListCache(self.local_csv_path, self.log)
+        self.mirror_table = MirrorTable(
+            os.path.join(CACHE_DIR, MIRROR_TABLE_NAME), self.log
+        )
+        self.proxy_discovery = ProxyDiscovery(
+            os.path.join(CACHE_DIR, PROXY_CACHE_NAME), logger=self.log
+        )
+        # Merged snapshots of every downloaded list, keyed by endpoint
+        self.history = ServerHistory(
+            os.path.join(CACHE_DIR, HISTORY_CSV_NAME),
+            self.args.history_max_age,
+            self.log,
+        )
+        # Parsed main list, reused while the list file is unchanged
+        self.snapshot = ListSnapshot(os.path.join(CACHE_DIR, SNAPSHOT_NAME), self.log)
+        main_list_stream = None
         if self.is_file_expired(self.local_csv_path):
-            self.log.info(get_text("vpnlist_expired"))
-            # Make sure download_vpn_list is defined or imported
-            self.download_vpn_list(self.args.url, self.local_csv_path)
+            if self.is_file_stale_usable(self.local_csv_path):
+                # Use the slightly outdated list now and refresh it meanwhile
+                self.log.info(get_text("vpnlist_stale_refreshing"))
+                # Set again by the refresh once its download is over
+                self.list_downloaded.clear()
+                self.refresh_thread = threading.Thread(
+                    target=self.refresh_in_background, daemon=True
+                )
+                self.refresh_thread.start()
+            else:
+                self.log.info(get_text("vpnlist_expired"))
+                main_list_stream = self.download_vpn_list(
+                    self.args.url, self.local_csv_path
+                )
 
-        # Load both lists
-        self.load_vpns(self.local_csv_path)  # Pass main list path
+        vpn_stream = None
+        if main_list_stream is None:
+            # Load both lists from disk
+            self.update_history()
+            self.load_vpns(self.main_list_path())  # Pass main list path
 
-        # --- Filtering ---
-        # Filter both lists by country
-        self.filter_by_country()
+            # --- Filtering ---
+            # Filter both lists by country
+            self.filter_by_country()
+        else:
+            # Probe servers while the rest of the main list is still downloading
+            self.load_qualified_vpns()
+            self.filter_by_country()
+            vpn_stream = self._stream_main_vpns(main_list_stream)
+
+        # Filter out unresponsive servers from both lists. Responders go to the
+        # candidate queue as they arrive; with an early start the connect loop
+        # begins once enough fast ones are in while the sweep goes on.
+        if self.candidates.min_ready > 0:
+            self.probe_thread = threading.Thread(
+                target=self._sweep, args=(vpn_stream,), daemon=True
+            )
+            self.probe_thread.start()
+            self.candidates.wait_ready()
+            if not self.candidates.closed:
+                self.log.info(get_text("vpnlist_early_start"), len(self.candidates))
+        else:
+            self._sweep(vpn_stream)
 
-        # Filter out unresponsive servers from both lists
-        self.filter_unresponsive_vpns()
+    def _sweep(self, vpn_stream=None):
+        """Runs the initial probe sweep and closes the candidate queue."""
+        try:
+            self.filter_unresponsive_vpns(vpn_stream)
+        except Exception as e:
+            self.log.exception(get_text("Availability probe failed for a VPN: %s") % e)
+        finally:
+            self.candidates.close()
+            self.initial_probe_done.set()
 
         # Log final counts
         self.log.info(
@@ -1319,209 +1513,315 @@ class VPNList:
         file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
         return datetime.now() - file_mod_time > timedelta(hours=self.args.expired_time)
 
-    def check_proxy(self, proxy_url):
-        try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            req = urllib.request.Request(proxy_url, headers=headers)
-            # 创建上下文以处理SSL验证
-            context = ssl.create_default_context()
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-
-            response = urllib.request.urlopen(req, timeout=5, context=context)
-            # 如果状态码是200，表示代理URL可用
-            return response.status == 200
-        except Exception:
-            self.log.error(get_text("proxy_check_failed"), proxy_url)
+    def is_file_stale_usable(self, file_path):
+        """Check if an expired file is still young enough to use while refreshing."""
+        if not os.path.exists(file_path) or self.args.stale_max_age <= 0:
             return False
+        file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+        return datetime.now() - file_mod_time <= timedelta(
+            hours=self.args.stale_max_age
+        )
 
-    # Returns the first available GitHub Proxy
-    def get_available_GitHub_proxy(self):
-        proxies = [
-            "https://ghproxy.net/",
-            "https://gh.llkk.cc/",
-            "https://ghp.ci/",
-            "https://ghproxy.cn/",
-            "https://github.akams.cn/",
-        ]
+    def refresh_in_background(self):
+        """Downloads a fresh list and merges its new servers into the main list.
 
-        for proxy in proxies:
-            if self.check_proxy(proxy):
-                self.log.info(get_text("available_GitHub_proxy"), proxy)
-                return proxy
+        Runs while the cached list is being probed. The first connection
+        attempt waits for the download (not for its probing), so the racer
+        never runs through a tunnel. New servers are probed once the initial
+        sweep is done and the responding ones are appended to ``main_vpns``
+        and the candidate queue, which the connect loop picks up as it goes.
+        """
+        try:
+            stream = self.download_vpn_list(self.args.url, self.local_csv_path)
+            if stream is None:
+                return
+            fresh_vpns = list(self.iter_vpn_rows(stream))
+            self.update_history()
+            self.initial_probe_done.wait()
+
+            new_vpns = [
+                vpn
+                for vpn in fresh_vpns
+                if self.country_filter(vpn)
+                and (vpn.ip, vpn.port, vpn.proto) not in self.probed_endpoints
+            ]
+            new_vpns, deferred_vpns = self.pre_rank(new_vpns)
+            if deferred_vpns:
+                with self.lock:
+                    self.deferred_vpns = self.pre_rank(
+                        self.deferred_vpns + deferred_vpns, split=False
+                    )
+            responding_vpns = self._probe_vpns(new_vpns)
+            if not getattr(self.args, "no_sort_latency", False):
+                responding_vpns.sort(key=lambda x: x[1])
 
-        return None
+            with self.lock:
+                self.main_vpns.extend(vpn for vpn, _ in responding_vpns)
+            self.log.info(
+                get_text("vpnlist_refreshed_in_background"),
+                len(fresh_vpns),
+                len(responding_vpns),
+            )
+        except Exception as e:
+            self.log.error(get_text("vpnlist_background_refresh_failed"), e)
 
-    # 常见代理端口，用于尝试通过不同端口下载列表
-    COMMON_PROXY_PORTS = {
-        "10808",
-        "7890",
-        "10809",
-    }
+    def update_history(self):
+        """Merges the cached list into the server history if it is newer."""
+        if not self.history.needs_merge(self.local_csv_path):
+            return
+        try:
+            added, updated, expired = self.history.merge(self.local_csv_path)
+            self.log.debug(get_text("vpnlist_history_merged"), added, updated, expired)
+        except Exception as e:
+            self.log.error(
+                get_text("Failed to read or process %s: %s") % (self.history.path, e)
+            )
 
-    def _detect_proxy_port(self):
-        """检测可用的代理端口"""
+    def _tag_history_only(self, vpns):
+        """Tags servers that are only known from the history.
 
-        def check_port(port):
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.settimeout(0.1)
-                    if sock.connect_ex(("127.0.0.1", int(port))) == 0:
-                        return True, port
-            except Exception:
-                pass
-            return False, None
+        A server whose LastSeen is older than the newest list merged into
+        the history was not in that list; both loaders decide it this way.
+        """
+        with self.lock:
+            rows = [self.index.row_of(vpn.endpoint) for vpn in vpns]
+            self.index.tag_history_only(rows, self.index.newest_seen())
+
+    def main_list_path(self):
+        """The file the main list is loaded from: the merged history if enabled."""
+        if self.history.enabled and os.path.exists(self.history.path):
+            return self.history.path
+        return self.local_csv_path
+
+    def _list_sources(self, url, backup_proxy=None):
+        """Builds the VPN list sources in order of preference for the download race."""
+        sources = []
+
+        # Local or environment proxy, used through a scoped opener only
+        proxy_url = self.proxy_discovery.discover()
+        if proxy_url:
+            self.log.info(get_text("proxy_running"), proxy_url)
+            sources.append(ListSource("proxy", url, url, proxy_url=proxy_url))
+        sources.append(ListSource("main", url, url))
+
+        github_proxies = list(GITHUB_PROXIES)
+        if backup_proxy and backup_proxy not in github_proxies:
+            github_proxies.append(backup_proxy)
+        # The racer orders the mirrors by health and skips backed-off ones
+        for github_proxy in github_proxies:
+            sources.append(
+                ListSource(
+                    github_proxy,
+                    f"{github_proxy}{BACKUP_LIST_URL}",
+                    BACKUP_LIST_URL,
+                    mirror=github_proxy,
+                    compressed_url=f"{github_proxy}{BACKUP_LIST_URL}.gz",
+                )
+            )
+        sources.append(
+            ListSource(
+                "github",
+                BACKUP_LIST_URL,
+                BACKUP_LIST_URL,
+                compressed_url=f"{BACKUP_LIST_URL}.gz",
+            )
+        )
+        return sources
+
+    def download_vpn_list(self, url, file_path, backup_proxy=None):
+        """Races all VPN list sources and opens the first valid one.
 
-        for port in self.COMMON_PROXY_PORTS:
-            success, port = check_port(port)
-            if success:
-                self.log.info(get_text("proxy_running"), port)
-                return True, port
+        The sources are started ``--hedge-delay`` seconds apart (a failing
+        source starts the next one at once); the first response whose CSV
+        header and first rows validate wins and the others are cancelled.
+        The winner is downloaded on its own thread, and ``list_downloaded``
+        is set once the transfer is over.
 
-        return False, None
+        Returns:
+            A line iterator over the list as it downloads (the cache file at
+            ``file_path`` is replaced once it completes), or None if the cached
+            list should be used instead.
+        """
+        self.list_downloaded.clear()
+        download = None
+        try:
+            download = self._open_vpn_list(url, file_path, backup_proxy)
+            return download
+        finally:
+            if download is None:
+                self.list_downloaded.set()
 
-    def download_vpn_list(self, url, file_path, backup_proxy=None):
-        """Download the VPN list from the given URL and save it to the specified file path."""
+    def _open_vpn_list(self, url, file_path, backup_proxy=None):
+        """Runs the source race of download_vpn_list() and opens the winner."""
         self.log.info(get_text("download_from_main_url"), url)
 
-        proxy_running, port = self._detect_proxy_port()
+        racer = ListSourceRacer(
+            self.list_cache,
+            hedge_delay=self.args.hedge_delay,
+            mirror_table=self.mirror_table,
+            logger=self.log,
+        )
+        winner = racer.race(self._list_sources(url, backup_proxy))
 
-        try:
-            if proxy_running:
-                try:
-                    # Download with proxy
-                    proxy = urllib.request.ProxyHandler(
-                        {
-                            "http": f"http://localhost:{port}",
-                            "https": f"https://localhost:{port}",
-                        }
-                    )
-                    opener = urllib.request.build_opener(proxy)
-                    urllib.request.install_opener(opener)
+        if winner is None:
+            self.log.error(get_text("failed_to_download_vpnlist"))
+            return None
 
-                    req = urllib.request.urlopen(url, timeout=10)
-                    data = req.read()
+        self.log.info(
+            get_text("vpnlist_source_won"), winner.source.url, winner.elapsed
+        )
+        if winner.source.proxy_url:
+            self.proxy_discovery.remember(winner.source.proxy_url)
+        if winner.not_modified:
+            self.list_cache.touch()
+            self.log.info(get_text("vpnlist_not_modified"), file_path)
+            return None
+        return ListDownload(
+            self.list_cache,
+            winner.source_key,
+            winner.response,
+            winner.prefix,
+            on_done=self.list_downloaded.set,
+        )
 
-                    # Check if the data is valid
-                    if (
-                        not data or len(data) < 1000
-                    ):  # Assuming valid data should be larger than 100 bytes
-                        raise ValueError(get_text("invalid_vpnlist_data"))
+    def wait_for_download(self):
+        """Waits until no list download is running.
 
-                    with open(file_path, "wb") as f:
-                        f.write(data)
-                    self.log.info(get_text("vpnlist_download_saved_to_file"), file_path)
-                except Exception as e:
-                    self.log.debug(get_text("system proxy error: %s") % e)
-                    raise Exception
+        A tunnel coming up would reroute the transfer and break it.
+        """
+        if not self.list_downloaded.is_set():
+            self.log.info(get_text("vpnlist_waiting_for_download"))
+            self.list_downloaded.wait()
+
+    def iter_vpn_rows(self, lines):
+        """Parses VPN list lines into compact ServerRecords, skipping broken rows.
+
+        Every record is added to the server index; for an endpoint that is
+        already indexed the existing record is yielded. The full VPNClient is
+        only built for the servers we try to connect to.
+        """
+        # Skip comment lines starting with '*'
+        rows = (line for line in lines if not line.startswith("*"))
+        for row in csv.DictReader(rows):
+            try:
+                record = ServerRecord.from_row(row)
+            except ValueError as e:
+                self.log.debug(
+                    get_text("Error parsing row from main VPN list: %s - %s")
+                    % (row.get("IP"), e)
+                )
+                continue
+            with self.lock:
+                record = self.index.add(record, row, SOURCE_MAIN)
+            yield record
+
+    def _stream_main_vpns(self, lines):
+        """Yields geo-filtered main list VPNs as the list downloads.
+
+        Once the download is done, servers that are only known from earlier
+        snapshots in the history follow. If the download breaks off, the rest
+        is taken from the history (or the cached list) so a partial transfer
+        never leaves us with fewer servers.
+        """
+        # Endpoints in list order, saved as the parsed snapshot at the end
+        seen = {}
+        received = 0
+        accepted = 0
+        completed = False
+        try:
+            for vpn in self.iter_vpn_rows(lines):
+                received += 1
+                if vpn.endpoint in seen:
+                    continue
+                seen[vpn.endpoint] = None
+                if self.country_filter(vpn):
+                    accepted += 1
+                    yield vpn
+            completed = True
+        except Exception as e:
+            self.log.error(get_text("failed_to_stream_vpnlist"), e)
+
+        if completed:
+            if self.list_cache.changed is False:
+                self.log.info(get_text("vpnlist_not_modified"), self.local_csv_path)
             else:
-                raise Exception
-        except Exception:
-            self.log.error(get_text("failed_to_download_from_main_url"))
-            original_url = "https://raw.githubusercontent.com/sinspired/VpngateAPI/main/servers.csv"
-
-            # Check available proxies and set an alternate download address
-            available_proxy = self.get_available_GitHub_proxy()
-            if available_proxy:
-                backup_url = f"{available_proxy}{original_url}"
                 self.log.info(
-                    get_text("attempt_download_from_backup_url"),
-                    backup_url,
+                    get_text("vpnlist_download_saved_to_file"), self.local_csv_path
                 )
-            else:
-                if backup_proxy:
-                    backup_url = f"{backup_proxy}{original_url}"
+            self.update_history()
+
+        if not completed or self.history.enabled:
+            extra_path = self.main_list_path()
+            if os.path.exists(extra_path):
+                extra_vpns = []
+                with open(extra_path, "r", encoding="utf8") as f:
+                    for vpn in self.iter_vpn_rows(f):
+                        if vpn.endpoint in seen:
+                            continue
+                        seen[vpn.endpoint] = None
+                        extra_vpns.append(vpn)
+                # The whole file is parsed first: LastSeen of the newest list
+                # in the history is only known once every row is indexed
+                self._tag_history_only(extra_vpns)
+                for vpn in extra_vpns:
+                    received += 1
+                    if self.country_filter(vpn):
+                        accepted += 1
+                        yield vpn
+
+        if completed:
+            # Everything in the main list file has been parsed by now
+            self.save_snapshot(self.main_list_path(), seen)
+
+        self.log.info(
+            get_text("load_vpn_servers_list"), get_text("main_vpn_csv"), received
+        )
+        if self.default_country_filter and received > accepted:
+            self.log.info(get_text("default_filter"), received - accepted)
+        self.log.info(
+            get_text("Main list VPNs after geo filter: %s (from %s)")
+            % (accepted, received)
+        )
+
+    def load_qualified_vpns(self):
+        """Loads qualified VPNs saved from previous stable connections."""
+        qualified_loaded_count = 0
+        if os.path.exists(CONFIG_DIR):  # Assume CONFIGS_DIR is defined
+            store = open_qualified_store()
+            try:
+                records = store.records()
+                with self.lock:
+                    for record in records:
+                        self.qualified_vpns.append(
+                            self.index.add(record, source=SOURCE_QUALIFIED)
+                        )
+                qualified_loaded_count = len(records)
+                if qualified_loaded_count > 0:
                     self.log.info(
-                        get_text("attempt_download_from_backup_url"),
-                        backup_url,
+                        get_text("load_vpn_servers_list"),
+                        get_text("qualified_vpn_csv"),
+                        qualified_loaded_count,
                     )
-                else:
-                    backup_url = original_url
-                    self.log.info(
-                        get_text("attempt_download_from_backup_url"),
-                        backup_url,
+                    self.log.debug(
+                        get_text("found_vpn_servers"),
+                        store.path,
+                        qualified_loaded_count,
                     )
-
-            try:
-                # Uninstall proxy
-                urllib.request.install_opener(None)
-                req = urllib.request.urlopen(backup_url)
-                data = req.read()
-                with open(file_path, "wb") as f:
-                    f.write(data)
-                self.log.info(get_text("vpnlist_download_saved_to_file"), file_path)
-            except Exception:
+                else:
+                    self.log.debug(get_text("file_path_not_found"), store.path)
+            except (sqlite3.Error, IOError, OSError, ValueError) as e:
                 self.log.error(
-                    get_text("failed_to_download_from_backup_url"), backup_url
+                    get_text("Failed to read or process %s: %s") % (store.path, e)
                 )
+        else:
+            self.log.info(get_text("Configs directory not found: %s") % CONFIG_DIR)
 
     def load_vpns(self, main_list_file_path):
         """Loads qualified VPNs and main list VPNs into separate lists."""
         self.log.info(get_text("loading_vpn_list"))
 
         # 1. Load Qualified VPNs from configs folder
-        qualified_loaded_count = 0
-        if os.path.exists(CONFIG_DIR):  # Assume CONFIGS_DIR is defined
-            qualified_vpn_csv = os.path.join(CONFIG_DIR, "qualified_vpns.csv")
-            if os.path.exists(qualified_vpn_csv):
-                try:
-                    with open(qualified_vpn_csv, "r", encoding="utf-8") as csvfile:
-                        reader = csv.DictReader(csvfile)
-                        for row in reader:
-                            try:
-                                config_data = base64.b64decode(
-                                    row["ConfigBase64"]
-                                ).decode("utf-8")
-                                vpn_data = {
-                                    "IP": row["IP"],
-                                    "Port": row["Port"],
-                                    "CountryLong": row["Country"],
-                                    "CountryShort": row["CountryCode"],
-                                    "#HostName": f"{row['IP']}:{row['Port']}",  # Construct HostName if needed by VPN class
-                                    "OpenVPN_ConfigData_Base64": base64.b64encode(
-                                        config_data.encode("utf-8")
-                                    ).decode("utf-8"),
-                                    # Add other fields expected by your VPN class constructor if necessary
-                                }
-                                # Assuming VPN class takes (vpn_data_dict, args)
-                                self.qualified_vpns.append(
-                                    VPNClient(vpn_data, self.args)
-                                )
-                                qualified_loaded_count += 1
-                            except Exception as e:
-                                self.log.error(
-                                    get_text(
-                                        "Error parsing row from qualified_vpns.csv: %s - %s"
-                                    )
-                                    % (row, e)
-                                )
-                    if qualified_loaded_count > 0:
-                        self.log.info(
-                            get_text("load_vpn_servers_list"),
-                            get_text("qualified_vpn_csv"),
-                            qualified_loaded_count,
-                        )
-                        self.log.debug(
-                            get_text("found_vpn_servers"),
-                            qualified_vpn_csv,
-                            qualified_loaded_count,
-                        )
-                    else:
-                        self.log.info(
-                            get_text("Found %s, but no VPNs were loaded from it.")
-                            % qualified_vpn_csv
-                        )
-                except Exception as e:
-                    self.log.error(
-                        get_text("Failed to read or process %s: %s")
-                        % (qualified_vpn_csv, e)
-                    )
-            else:
-                self.log.debug(get_text("file_path_not_found"), qualified_vpn_csv)
-        else:
-            self.log.info(get_text("Configs directory not found: %s") % CONFIG_DIR)
+        self.load_qualified_vpns()
 
         # 2. Load Main VPN list
         main_list_loaded_count = 0
@@ -1531,13 +1831,26 @@ class VPNList:
             # sys.exit(1) # Optional: exit if main list is absolutely required
         else:
             try:
-                with open(main_list_file_path, "r", encoding="utf8") as f:
-                    # Skip comment lines starting with '*' or '#' (adjust if needed)
-                    rows = filter(lambda r: not r.startswith("*"), f)
-                    reader = csv.DictReader(rows)
-                    # Assuming VPN class takes (row_dict, args)
-                    self.main_vpns = [VPNClient(row, self.args) for row in reader]
-                    main_list_loaded_count = len(self.main_vpns)
+                snapshot = self.snapshot.load(main_list_file_path)
+                if snapshot is not None:
+                    with self.lock:
+                        self.main_vpns = [
+                            self.index.add(record, source=SOURCE_MAIN, metrics=metrics)
+                            for record, metrics in snapshot
+                        ]
+                    self.log.debug(
+                        get_text("vpnlist_snapshot_loaded"),
+                        len(self.main_vpns),
+                        main_list_file_path,
+                    )
+                else:
+                    with open(main_list_file_path, "r", encoding="utf8") as f:
+                        self.main_vpns = list(self.iter_vpn_rows(f))
+                    self.save_snapshot(
+                        main_list_file_path, (vpn.endpoint for vpn in self.main_vpns)
+                    )
+                self._tag_history_only(self.main_vpns)
+                main_list_loaded_count = len(self.main_vpns)
                 self.log.info(
                     get_text("load_vpn_servers_list"),
                     get_text("main_vpn_csv"),
@@ -1554,101 +1867,317 @@ class VPNList:
                     % (main_list_file_path, e)
                 )
 
-    def filter_by_country(self):
-        """Filters both qualified and main VPN lists based on geographic information."""
-        filters = []
-        # building the filters list based on args.eu, args.us, args.country
+    def save_snapshot(self, list_path, endpoints):
+        """Saves the parsed servers of ``list_path`` for the next start."""
+        with self.lock:
+            rows = dict.fromkeys(self.index.row_of(endpoint) for endpoint in endpoints)
+        self.snapshot.save(list_path, self.index, list(rows))
+
+    def _build_country_filter(self):
+        """Builds the geographic predicate from args.eu, args.us and args.country.
+
+        Without any explicit filter, servers in China (CN) are excluded by default.
+        The selected codes are also kept in ``country_codes`` / ``country_exclude``
+        for the bulk filters on the server index.
+        """
+        countries = set()
+        # building the country set based on args.eu, args.us, args.country
         if self.args.eu:
             self.log.info(get_text("Including VPNs in Europe"))
-            filters.append(
-                lambda vpn: vpn.country_code in EU_COUNTRIES
-            )  # Assume EU_COUNTRIES is defined
+            countries.update(code for group in EU_COUNTRIES for code in group)
 
         if self.args.us:
             self.log.info(get_text("Including VPNs in USA"))
-            filters.append(lambda vpn: vpn.country_code == "US")
+            countries.add("US")
 
         if self.args.country:
-            countries = set(map(str.upper, self.args.country))
-            self.log.info(get_text("Including VPNs in %s") % countries)
-            filters.append(lambda vpn: vpn.country_code in countries)
-
-        # building a default filter to exclude "CN" if no other filters are applied
-        exclude_countries = ["CN"]
-        excluded_vpns = [
-            vpn
-            for vpn in self.qualified_vpns + self.main_vpns
-            if vpn.country_code in exclude_countries
-        ]
-        if excluded_vpns:
-            self.log.debug("默认排除：")
-            for vpn in excluded_vpns:
-                self.log.debug(vpn)
-            self.log.info(get_text("default_filter"), len(excluded_vpns))
-            filters.append(lambda vpn: vpn.country_code not in exclude_countries)
-
-        if filters:
-            self.log.info(get_text("Applying geographic filters..."))
+            selected = set(map(str.upper, self.args.country))
+            self.log.info(get_text("Including VPNs in %s") % selected)
+            countries.update(selected)
 
-            def filter_fn(vpn):
-                return any(f(vpn) for f in filters)
+        self.default_country_filter = not countries
+        if self.default_country_filter:
+            # default filter to exclude "CN" if no other filters are applied
+            countries = {"CN"}
+        self.country_codes = countries
+        self.country_exclude = self.default_country_filter
 
-            orig_qualified_count = len(self.qualified_vpns)
-            orig_main_count = len(self.main_vpns)
+        exclude = self.country_exclude
+        return lambda vpn: (vpn.country_code in countries) != exclude
 
-            self.qualified_vpns = list(filter(filter_fn, self.qualified_vpns))
-            self.main_vpns = list(filter(filter_fn, self.main_vpns))
+    def _view_rows(self, source, *masks):
+        """Index rows loaded from ``source`` that pass every mask, in load order.
 
-            self.log.info(
-                get_text("Qualified VPNs after geo filter: %s (from %s)")
-                % (len(self.qualified_vpns), orig_qualified_count)
+        A server that is both qualified and in the main list is only kept in
+        the qualified view.
+        """
+        exclude = SOURCE_QUALIFIED if source == SOURCE_MAIN else 0
+        return self.index.select(
+            self.index.combine(self.index.source_mask(source, exclude), *masks)
+        )
+
+    def filter_by_country(self):
+        """Filters both qualified and main VPN lists based on geographic information."""
+        orig_qualified_count = len(self.qualified_vpns)
+        orig_main_count = len(self.main_vpns)
+
+        with self.lock:
+            country_mask = self.index.country_mask(
+                self.country_codes, self.country_exclude
             )
+            if self.default_country_filter:
+                excluded_rows = self.index.select(
+                    self.index.combine(
+                        self.index.source_mask(SOURCE_MAIN | SOURCE_QUALIFIED),
+                        self.index.country_mask(
+                            self.country_codes, not self.country_exclude
+                        ),
+                    )
+                )
+                if excluded_rows:
+                    self.log.debug("默认排除：")
+                    for vpn in self.index.records_at(excluded_rows):
+                        self.log.debug(vpn)
+                    self.log.info(get_text("default_filter"), len(excluded_rows))
+
+            self.log.info(get_text("Applying geographic filters..."))
+
+            self.qualified_vpns = self.index.records_at(
+                self._view_rows(SOURCE_QUALIFIED, country_mask)
+            )
+            self.main_vpns = self.index.records_at(
+                self._view_rows(SOURCE_MAIN, country_mask)
+            )
+
+        self.log.info(
+            get_text("Qualified VPNs after geo filter: %s (from %s)")
+            % (len(self.qualified_vpns), orig_qualified_count)
+        )
+        self.log.info(
+            get_text("Main list VPNs after geo filter: %s (from %s)")
+            % (len(self.main_vpns), orig_main_count)
+        )
+
+    def _probe_vpns(self, vpns):
+        """Probes VPN servers concurrently as they are taken from ``vpns``.
+
+        All probes run in one thread on the asyncio probe engine, so a
+        multi-thousand-server pool is probed within about one timeout window.
+        Servers with a fresh result in the probe cache are not probed again,
+        nor are servers that recently did not respond.
+
+        Returns:
+            list: ``(vpn, latency)`` tuples of the responding servers.
+        """
+        responding_vpns = []
+        cache_hits = [0, 0]  # fresh, backing off
+
+        def uncached(vpns):
+            deep = self.probe_engine.deep_tcp
+            for vpn in vpns:
+                # An endpoint listed more than once (or in both lists) is probed once
+                if vpn.endpoint in self.probed_endpoints:
+                    continue
+                self.probed_endpoints.add(vpn.endpoint)
+                if self.probe_cache.enabled:
+                    # Cache hits are not queued while a connection attempt runs either
+                    self.probe_engine.wait_resumed()
+                    cached = self.probe_cache.fresh(
+                        vpn.endpoint,
+                        require_handshake=deep
+                        and vpn.proto == "tcp"
+                        and not vpn.tls_wrapped,
+                    )
+                    if cached:
+                        cache_hits[0] += 1
+                        self._apply_probe(
+                            vpn, ProbeResult.from_samples(*cached), responding_vpns
+                        )
+                        continue
+                    if self.probe_cache.backing_off(vpn.endpoint):
+                        cache_hits[1] += 1
+                        self._apply_probe(vpn, ProbeResult(False), responding_vpns)
+                        continue
+                yield vpn
+
+        for vpn, result in self.probe_engine.run(uncached(vpns)):
+            if result.conclusive and not result.partial:
+                # A server that only missed the short first pass is not backed off
+                self.probe_cache.record(
+                    vpn.endpoint, result.samples, result.lost, result.handshake
+                )
+            self._apply_probe(vpn, result, responding_vpns)
+
+        window = self.probe_engine.last_window
+        if window is not None and window.peak:
             self.log.info(
-                get_text("Main list VPNs after geo filter: %s (from %s)")
-                % (len(self.main_vpns), orig_main_count)
+                get_text("vpnlist_probe_concurrency"),
+                window.peak,
+                int(window.window),
+                window.maximum,
+                window.decreases,
             )
 
-    def filter_unresponsive_vpns(self):
-        """Probes VPN servers, measures latency, and removes unresponsive ones."""
-        self.log.info(get_text("filtering_servers"))
+        if self.probe_cache.enabled:
+            self.log.debug(get_text("vpnlist_probe_cache_hits"), *cache_hits)
+            try:
+                self.probe_cache.flush()
+            except sqlite3.Error as e:
+                self.log.debug(f"Failed to save probe cache: {e}")
+        return responding_vpns
+
+    def _apply_probe(self, vpn, result, responding_vpns):
+        """Stores a probe result in the index and queues a responding server.
+
+        A partial result queues the server at once; the full result that
+        follows re-ranks it and adds it to ``responding_vpns``.
+        """
+        with self.lock:
+            self.index.set_latency(vpn.endpoint, result.latency, result.handshake)
+            if result.responding:
+                source = self.index.source[self.index.row_of(vpn.endpoint)]
+                qualified = source & SOURCE_QUALIFIED
+                self.candidates.push(
+                    vpn,
+                    result.latency,
+                    source,
+                    self.reliability.get(
+                        vpn.endpoint, QUALIFIED_RELIABILITY if qualified else 0.0
+                    ),
+                )
+                self.index.set_stats(
+                    vpn.endpoint,
+                    result.rtt_min,
+                    result.median,
+                    result.p90,
+                    result.jitter,
+                    result.loss,
+                )
+        if result.responding and not result.partial:
+            # 对于 tls-auth / tls-crypt 的 UDP 服务器，latency为udp_latency参数
+            responding_vpns.append((vpn, result.latency))
+
+    def pre_rank(self, vpns, split=True):
+        """Orders main list VPNs by the pre-ranking model, best first.
+
+        Returns:
+            tuple: ``(top, rest)`` where ``top`` holds the first ``probe_top``
+            VPNs to probe now, or the whole ranked list if ``split`` is False.
+        """
+        with self.lock:
+            rows = list(dict.fromkeys(self.index.row_of(vpn.endpoint) for vpn in vpns))
+            ranked = self.index.records_at(self.rank_model.ranked(self.index, rows))
+        if not split:
+            return ranked
+        if not self.probe_top:
+            return ranked, []
+        return ranked[: self.probe_top], ranked[self.probe_top :]
+
+    def _split_top_tier(self):
+        """Pre-ranks ``main_vpns``, defers all but the top tier and returns it."""
+        top, self.deferred_vpns = self.pre_rank(self.main_vpns)
+        if self.deferred_vpns:
+            self.log.info(get_text("vpnlist_pre_ranked"), len(self.main_vpns), len(top))
+        return top
+
+    def probe_next_tier(self):
+        """Probes the next tier of deferred main list VPNs.
+
+        Returns:
+            list: The responding VPNs of the tier, which are also appended to
+            ``main_vpns``; empty once nothing is deferred any more.
+        """
+        with self.lock:
+            tier = self.deferred_vpns[: self.probe_top or None]
+            self.deferred_vpns = self.deferred_vpns[len(tier) :]
+            remaining = len(self.deferred_vpns)
+        tier = [vpn for vpn in tier if vpn.endpoint not in self.probed_endpoints]
+        if not tier:
+            return []
+        self.log.info(get_text("vpnlist_probing_next_tier"), len(tier), remaining)
+        responding_vpns = self._probe_vpns(tier)
+        if not getattr(self.args, "no_sort_latency", False):
+            responding_vpns.sort(key=lambda x: x[1])
+        tier = [vpn for vpn, _ in responding_vpns]
+        with self.lock:
+            self.main_vpns.extend(tier)
+        return tier
 
-        vpns_to_probe = self.qualified_vpns + self.main_vpns
+    def filter_unresponsive_vpns(self, vpn_stream=None):
+        """Probes VPN servers, measures latency, and removes unresponsive ones.
 
-        if not vpns_to_probe:
+        Args:
+            vpn_stream (iterable, optional): Main list VPNs that are still being
+                downloaded. They are probed as they arrive, so probing overlaps
+                the download.
+
+        Only the top ``probe_top`` main list VPNs are probed here, the rest is
+        kept in ``deferred_vpns`` for ``probe_next_tier()``. A loaded list is
+        pre-ranked first; a streamed list probes its first ``probe_top`` rows
+        as they arrive and pre-ranks only the deferred remainder.
+        """
+        self.log.info(get_text("filtering_servers"))
+
+        if not (self.qualified_vpns or self.main_vpns) and vpn_stream is None:
             self.log.info(get_text("No VPNs to probe."))
             return
 
         n = self.args.probes  # Number of concurrent probes
-        responding_vpns = []
 
-        self.log.info(get_text("probing_vpns_concurrently"), len(vpns_to_probe), n)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=n) as ex:
-            futures = {ex.submit(vpn.is_listening): vpn for vpn in vpns_to_probe}
-
-            for future in concurrent.futures.as_completed(futures):
-                vpn = futures[future]
-                try:
-                    is_responding, latency = future.result()
-                    if is_responding:
-                        # 对于UDP协议，latency为udp_latency参数
-                        responding_vpns.append((vpn, latency))
-                except Exception as e:
-                    self.log.exception(
-                        get_text("Availability probe failed for a VPN: %s") % e
-                    )
+        def ranked_stream(stream):
+            # Rows are probed as they arrive; ranking would have to wait for
+            # the whole list, so only the rows past the top tier are ranked
+            rest = []
+            for vpn in stream:
+                self.main_vpns.append(vpn)
+                if self.probe_top and len(self.main_vpns) > self.probe_top:
+                    rest.append(vpn)
+                else:
+                    yield vpn
+            if rest:
+                self.deferred_vpns = self.pre_rank(rest, split=False)
+                self.log.info(
+                    get_text("vpnlist_streamed_top_tier"),
+                    len(self.main_vpns) - len(rest),
+                    len(rest),
+                )
 
-        # 默认进行排序，除非显式指定 --no-sort-latency
-        if not getattr(self.args, "no_sort_latency", False):
-            self.log.info(get_text("h_arg_sort_latency"))
-            responding_vpns.sort(key=lambda x: x[1])  # Sort by latency (ascending)
+        if vpn_stream is None:
+            main_vpns = self._split_top_tier()
+            self.log.info(
+                get_text("probing_vpns_concurrently"),
+                len(self.qualified_vpns) + len(main_vpns),
+                n,
+            )
+            vpns_to_probe = itertools.chain(self.qualified_vpns, main_vpns)
         else:
-            self.log.info(get_text("h_arg_no_sort_latency"))
+            self.log.info(get_text("probing_vpns_streaming"), n)
+            vpns_to_probe = itertools.chain(
+                self.qualified_vpns, ranked_stream(vpn_stream)
+            )
 
-        # Update the lists with sorted VPNs
-        self.qualified_vpns = [
-            vpn for vpn, _ in responding_vpns if vpn in self.qualified_vpns
-        ]
-        self.main_vpns = [vpn for vpn, _ in responding_vpns if vpn in self.main_vpns]
+        self._probe_vpns(vpns_to_probe)
+
+        # Rebuild both lists from the index: probed latencies live in its columns
+        with self.lock:
+            masks = (
+                self.index.country_mask(self.country_codes, self.country_exclude),
+                self.index.alive_mask(),
+            )
+            qualified_rows = self._view_rows(SOURCE_QUALIFIED, *masks)
+            main_rows = self._view_rows(SOURCE_MAIN, *masks)
+
+            # 默认进行排序，除非显式指定 --no-sort-latency
+            if not getattr(self.args, "no_sort_latency", False):
+                self.log.info(get_text("h_arg_sort_latency"))
+                # Sort by latency (ascending)
+                qualified_rows = self.index.ranked(qualified_rows)
+                main_rows = self.index.ranked(main_rows)
+            else:
+                self.log.info(get_text("h_arg_no_sort_latency"))
+
+            self.qualified_vpns = self.index.records_at(qualified_rows)
+            self.main_vpns = self.index.records_at(main_rows)
 
         self.log.debug(
             get_text("Qualified VPNs after responsiveness filter: %s"),
@@ -1677,13 +2206,11 @@ def speedtest():
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
-    ctx = ssl.create_default_context()
-
     try:
         req = urllib.request.Request(url, headers=headers)
         start_time = time.perf_counter()
 
-        with urllib.request.urlopen(req, timeout=timeout, context=ctx) as response:
+        with get_http_client().open(req, timeout=timeout) as response:
             file_size = 0
             end_time = start_time + duration
 
@@ -1743,101 +2270,95 @@ def single_vpn_main(args):
         logging.error("Aborted")
 
 
-def _try_connect_from_list(
-    vpn_list, list_name, start_index, total_overall_count, logger
-):
-    """Helper function to attempt connecting to VPNs in a list."""
-    connection_established = False
-    if not vpn_list:
-        logger.info(get_text("No VPNs to try in %s list.") % list_name)
-        return False
+def _try_connect_candidates(candidates, start_index, logger, args, vpnlist=None):
+    """Tries VPNs in the order the candidate queue hands them out.
 
-    total_in_list = len(vpn_list)
-    logger.debug(
-        get_text("Attempting connections from %s list (%s VPNs)...")
-        % (list_name, total_in_list)
-    )
+    Waits for more candidates while probing is still going on, so the first
+    attempt does not have to wait for the whole sweep. A running list
+    download is finished first and probing is paused while an attempt runs:
+    once the tunnel is up, both would go through it.
 
-    for i, vpn in enumerate(vpn_list):
-        current_overall_index = start_index + i + 1  # 1-based index
+    Returns:
+        tuple: ``(connection_established, attempts)``.
+    """
+    connection_established = False
+    attempts = 0
+    while True:
+        candidate = candidates.pop()
+        if candidate is None:
+            break
+        record, source = candidate
+        attempts += 1
+        if source & SOURCE_QUALIFIED:
+            list_name = get_text("qualified")
+        elif source & SOURCE_HISTORY:
+            list_name = get_text("history_list")
+        else:
+            list_name = get_text("main_list")
         print(
             "\033[90m----------------------------------------------------------------------+\33[0m"
         )
-        # Display index within the current list and overall index
-        if total_in_list != total_overall_count:
-            print(
-                f"[\033[32m{list_name} {i + 1}\033[0m\033[90m/\033[0m\033[32m{total_in_list}\033[0m] \033[90m{current_overall_index}/{total_overall_count}\033[0m {vpn}\033[90m"
-            )
-        else:
-            print(
-                f"[\033[32m{list_name} {i + 1}\033[0m\033[90m/\033[0m\033[32m{total_in_list}\033[0m] {vpn}\033[90m"
-            )
+        # Overall index; the total grows while probing goes on
+        print(
+            f"[\033[32m{list_name} {start_index + attempts}\033[0m\033[90m/\033[0m\033[32m{candidates.total}\033[0m] {record}\033[90m"
+        )
 
+        if vpnlist:
+            vpnlist.wait_for_download()
+            vpnlist.probe_engine.pause()
         try:
+            vpn = VPNClient.from_record(record, args)
             res = vpn.connect()
             if res:
                 logger.info(
-                    get_text("Connection established and confirmed with: %s") % vpn
+                    get_text("Connection established and confirmed with: %s") % record
                 )
                 connection_established = True
                 break
             else:
                 logger.debug(
-                    get_text("Connection attempt declined or failed for: %s") % vpn
+                    get_text("Connection attempt declined or failed for: %s") % record
                 )
         except KeyboardInterrupt:
             logger.warning(get_text("Connection process interrupted by user."))
             connection_established = True
             break
         except Exception as e:
-            logger.error(f"Error connecting to VPN {vpn}: {e}", exc_info=True)
+            logger.error(f"Error connecting to VPN {record}: {e}", exc_info=True)
+        finally:
+            if vpnlist:
+                vpnlist.probe_engine.resume()
 
-    return connection_established
+    return connection_established, attempts
 
 
 def vpn_list_main(args):
-    """Fetches lists of VPNs and connects, prioritizing the qualified list."""
+    """Fetches lists of VPNs and connects, best candidates first."""
     logger = logging.getLogger("VPNListMain")
     vpnlist = VPNList(args)
 
     connection_established = False
-    total_qualified = len(vpnlist.qualified_vpns)
-    total_main = len(vpnlist.main_vpns)
-    total_overall = total_qualified + total_main
+    attempts = 0
+    while True:
+        connection_established, tried = _try_connect_candidates(
+            vpnlist.candidates, attempts, logger, args, vpnlist
+        )
+        attempts += tried
+        if connection_established:
+            break
+        if vpnlist.deferred_vpns:
+            # The top tier is exhausted: probe the lower-ranked servers
+            vpnlist.probe_next_tier()
+        elif vpnlist.refresh_thread and vpnlist.refresh_thread.is_alive():
+            # Wait for the servers the background refresh is still probing
+            vpnlist.refresh_thread.join()
+        else:
+            break
 
-    if total_overall == 0:
+    if attempts == 0:
         logger.warning("\033[31m" + get_text("no_vpns_after_filter") + "\033[0m")
         sys.exit(1)
 
-    if total_qualified > 0:
-        connection_established = _try_connect_from_list(
-            vpnlist.qualified_vpns,
-            get_text("qualified"),
-            start_index=0,
-            total_overall_count=total_overall,
-            logger=logger,
-        )
-    else:
-        logger.debug(get_text("Skipping qualified VPN list as it is empty."))
-
-    if not connection_established:
-        if total_main > 0:
-            connection_established = _try_connect_from_list(
-                vpnlist.main_vpns,
-                get_text("main_list"),
-                start_index=total_qualified,
-                total_overall_count=total_overall,
-                logger=logger,
-            )
-        else:
-            logger.info(get_text("Skipping main VPN list as it is empty."))
-    else:
-        logger.info(
-            get_text(
-                "Connection already established from the qualified list. Skipping main list."
-            )
-        )
-
     try:
         if "TEMP_DIR" in globals() and os.path.exists(TEMP_DIR):
             shutil.rmtree(TEMP_DIR)
@@ -1929,10 +2450,22 @@ def parse_args():
     p.add_argument(
         "--probes",
         action="store",
-        default=100,
+        default=DEFAULT_PROBE_CONCURRENCY,
         type=int,
         help=get_text("h_arg_probes"),
     )
+    p.add_argument(
+        "--hedge-pool",
+        action="store",
+        default=DEFAULT_HEDGE_POOL,
+        type=int,
+        help=get_text("h_arg_hedge_pool"),
+    )
+    p.add_argument(
+        "--fixed-probes",
+        action="store_true",
+        help=get_text("h_arg_fixed_probes"),
+    )
     p.add_argument(
         "--probe-timeout",
         action="store",
@@ -1940,6 +2473,60 @@ def parse_args():
         type=int,
         help=get_text("h_arg_probe_timeout"),
     )
+    p.add_argument(
+        "--deep-probe",
+        action="store_true",
+        help=get_text("h_arg_deep_probe"),
+    )
+    p.add_argument(
+        "--probe-samples",
+        action="store",
+        default=DEFAULT_PROBE_SAMPLES,
+        type=int,
+        help=get_text("h_arg_probe_samples"),
+    )
+    p.add_argument(
+        "--early-start",
+        action="store",
+        default=DEFAULT_EARLY_START,
+        type=int,
+        help=get_text("h_arg_early_start"),
+    )
+    p.add_argument(
+        "--latency-budget",
+        action="store",
+        default=DEFAULT_LATENCY_BUDGET,
+        type=float,
+        help=get_text("h_arg_latency_budget"),
+    )
+    p.add_argument(
+        "--probe-cache-ttl",
+        action="store",
+        default=DEFAULT_PROBE_CACHE_TTL,
+        type=float,
+        help=get_text("h_arg_probe_cache_ttl"),
+    )
+    p.add_argument(
+        "--probe-top",
+        action="store",
+        default=DEFAULT_PROBE_TOP,
+        type=int,
+        help=get_text("h_arg_probe_top"),
+    )
+    p.add_argument(
+        "--rank-weights",
+        action="store",
+        default=None,
+        type=parse_rank_weights,
+        help=get_text("h_arg_rank_weights"),
+    )
+    p.add_argument(
+        "--hedge-delay",
+        action="store",
+        default=DEFAULT_HEDGE_DELAY,
+        type=float,
+        help=get_text("h_arg_hedge_delay"),
+    )
     p.add_argument(
         "--url",
         action="store",
@@ -1987,6 +2574,20 @@ def parse_args():
         type=int,
         help=get_text("h_arg_expired_time"),
     )
+    p.add_argument(
+        "--stale-max-age",
+        action="store",
+        default=DEFAULT_STALE_MAX_AGE,
+        type=float,
+        help=get_text("h_arg_stale_max_age"),
+    )
+    p.add_argument(
+        "--history-max-age",
+        action="store",
+        default=DEFAULT_HISTORY_MAX_AGE,
+        type=float,
+        help=get_text("h_arg_history_max_age"),
+    )
     p.add_argument(
         "--min-speed",
         "-ms",
@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import threading
+
+try:
+    from .module_store import SOURCE_MAIN, SOURCE_QUALIFIED
+except ImportError:
+    # 作为脚本运行时的绝对导入
+    from module_store import SOURCE_MAIN, SOURCE_QUALIFIED
+
+# 等待时的轮询间隔，使 Windows 上的 Ctrl+C 也能及时响应
+WAIT_POLL_INTERVAL = 0.5  # second
+# 可靠性得分对排序的影响: 得分为 1 时延迟按 1/4 计，为 -1 时按 4 倍计
+RELIABILITY_SCALE = 4.0
+
+
+class CandidateQueue:
+    """统一的候选服务器池: 探测结果的实时优先队列，探测一边进行，连接循环一边取出当前最优的服务器
+
+    以 (IP, 端口, 协议) 为键去重，每个端点只加入一次，并带有来源标记 (SOURCE_* 的组合)；
+    再次加入尚未取出的端点时按新的延迟重新排序。
+    优先级为按连接历史的可靠性得分 (-1 到 1) 调整后的延迟，各来源统一排序；
+    不按延迟排序时优质服务器在前，其余按加入顺序。
+    探测结束后调用 close()，此后 pop() 在队列为空时立即返回 None。
+    """
+
+    def __init__(self, min_ready=0, latency_budget=float("inf"), sort_latency=True):
+        self.min_ready = min_ready
+        self.latency_budget = latency_budget
+        self.sort_latency = sort_latency
+        self._cond = threading.Condition()
+        self._heap = []
+        self._order = itertools.count()
+        self._seen = set()
+        # 尚未取出的端点 -> 其有效堆条目的排序键，键不符的堆条目已被重新排序取代
+        self._queued = {}
+        self._fast = 0
+        self.total = 0
+        self.closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queued)
+
+    @staticmethod
+    def cost(latency, reliability=0.0):
+        """排序用的代价，越小越优先"""
+        return latency * RELIABILITY_SCALE ** -reliability
+
+    def __contains__(self, endpoint):
+        with self._cond:
+            return endpoint in self._seen
+
+    def push(self, record, latency, source=SOURCE_MAIN, reliability=0.0):
+        """加入一个有响应的服务器，已加入过的端点只在尚未取出时重新排序"""
+        if self.sort_latency:
+            key = self.cost(latency, reliability)
+        else:
+            key = 0 if source & SOURCE_QUALIFIED else 1
+        with self._cond:
+            if record.endpoint in self._seen:
+                if self._queued.get(record.endpoint, key) != key:
+                    self._queued[record.endpoint] = key
+                    heapq.heappush(self._heap, (key, next(self._order), source, record))
+                return
+            self._seen.add(record.endpoint)
+            self._queued[record.endpoint] = key
+            heapq.heappush(self._heap, (key, next(self._order), source, record))
+            self.total += 1
+            if latency <= self.latency_budget:
+                self._fast += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """标记探测已结束"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    @property
+    def ready(self):
+        """已有足够多的延迟在预算内的服务器，或探测已结束"""
+        return self.closed or (0 < self.min_ready <= self._fast)
+
+    def wait_ready(self):
+        """阻塞直到可以开始连接 (min_ready 为 0 时等待探测结束)"""
+        with self._cond:
+            while not self.ready:
+                self._cond.wait(WAIT_POLL_INTERVAL)
+
+    def pop(self):
+        """取出当前最优的服务器，返回 (record, source)
+
+        Blocks while the queue is empty and probing is still going on;
+        returns None once probing is done and the queue is empty.
+        """
+        with self._cond:
+            while True:
+                while self._heap:
+                    key, _, source, record = heapq.heappop(self._heap)
+                    if self._queued.get(record.endpoint) == key:
+                        del self._queued[record.endpoint]
+                        return record, source
+                if self.closed:
+                    return None
+                self._cond.wait(WAIT_POLL_INTERVAL)
@@ -0,0 +1,129 @@
+import re
+
+# 内联证书等块 (<ca>...</ca>) 以及因服务器而异的 remote / proto 指令行
+_SPLIT_RE = re.compile(
+    r"(?P<block><(?P<tag>[A-Za-z][\w-]*)>.*?</(?P=tag)>)"
+    r"|(?P<line>^[ \t]*(?:remote|proto)[ \t][^\r\n]*)",
+    re.S | re.M,
+)
+
+# <connection> 块中各有自己的 remote / proto，这样的配置只拆出指令行
+_CONNECTION_RE = re.compile(r"^[ \t]*<connection>", re.M)
+_DIRECTIVE_RE = re.compile(r"^[ \t]*(?:remote|proto)[ \t][^\r\n]*", re.M)
+
+# tls-auth / tls-crypt 指令或内联密钥块
+_TLS_WRAP_RE = re.compile(r"^[ \t]*<?tls-(?:auth|crypt(?:-v2)?)\b", re.M)
+
+
+class _Template(tuple):
+    """驻留的配置模板 (片段元组)，附带只需计算一次的属性"""
+
+    def __new__(cls, segments):
+        template = super().__new__(cls, segments)
+        template.tls_wrapped = any(
+            segment is not None and _TLS_WRAP_RE.search(segment)
+            for segment in template
+        )
+        return template
+
+
+class CompactConfig:
+    """拆分后的 OpenVPN 配置: 共享片段的模板加上该服务器自己的指令行
+
+    ``segments`` is an interned tuple of interned text segments in which
+    ``None`` marks where the next per-server line goes; ``lines`` holds those
+    lines (remote / proto) in order.
+    """
+
+    __slots__ = ("segments", "lines")
+
+    def __init__(self, segments, lines):
+        self.segments = segments
+        self.lines = lines
+
+    @property
+    def tls_wrapped(self):
+        """控制通道是否经 tls-auth / tls-crypt 包装 (此时无法用未签名的包探测)
+
+        Computed once per interned template by ConfigPool.template().
+        """
+        return self.segments.tls_wrapped
+
+    def text(self):
+        """重建完整的配置文本"""
+        lines = iter(self.lines)
+        return "".join(
+            next(lines) if segment is None else segment for segment in self.segments
+        )
+
+
+class ConfigPool:
+    """OpenVPN 配置片段的驻留池
+
+    几乎所有 VPNGate 配置都内嵌相同的 <ca> / <cert> / <key> 块和通用指令，
+    拆分后相同的片段和模板只保存一份。
+    """
+
+    def __init__(self):
+        self._segments = {}
+        self._templates = {}
+
+    def intern(self, segment):
+        return self._segments.setdefault(segment, segment)
+
+    def template(self, segments):
+        segments = tuple(segments)
+        template = self._templates.get(segments)
+        if template is None:
+            template = self._templates[segments] = _Template(segments)
+        return template
+
+    def compact(self, text):
+        """将配置文本拆分为 CompactConfig
+
+        A config with ``<connection>`` blocks (e.g. a user's .ovpn file) is
+        not compacted: their remote lines would be folded into a shared block.
+        """
+        if _CONNECTION_RE.search(text):
+            return self._split_directives(text)
+        segments = []
+        lines = []
+        pos = 0
+        for match in _SPLIT_RE.finditer(text):
+            if match.start() > pos:
+                segments.append(self.intern(text[pos : match.start()]))
+            if match.group("block") is not None:
+                segments.append(self.intern(match.group("block")))
+            else:
+                segments.append(None)
+                lines.append(match.group("line"))
+            pos = match.end()
+        if pos < len(text):
+            segments.append(self.intern(text[pos:]))
+        return CompactConfig(self.template(segments), tuple(lines))
+
+    @staticmethod
+    def _split_directives(text):
+        """只在 remote / proto 行处拆分，不驻留任何片段"""
+        segments = []
+        lines = []
+        pos = 0
+        for match in _DIRECTIVE_RE.finditer(text):
+            segments.append(text[pos : match.start()])
+            segments.append(None)
+            lines.append(match.group())
+            pos = match.end()
+        segments.append(text[pos:])
+        return CompactConfig(_Template(segments), tuple(lines))
+
+    def __len__(self):
+        return len(self._segments)
+
+    @property
+    def size(self):
+        """驻留片段的总字符数"""
+        return sum(map(len, self._segments))
+
+
+# 进程内共享的配置池，主列表、历史记录和优质服务器共用
+CONFIG_POOL = ConfigPool()
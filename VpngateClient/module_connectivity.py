@@ -2,16 +2,24 @@ import logging
 import ssl
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from urllib.request import Request
+
+try:
+    from .module_http import get_http_client
+except ImportError:
+    # 作为脚本运行时的绝对导入
+    from module_http import get_http_client
 
 DEFAULT_TIMEOUT = 5
 
 
 class ConnectivityChecker:
-    def __init__(self, urls, timeout=DEFAULT_TIMEOUT, logger=None):
+    def __init__(self, urls, timeout=DEFAULT_TIMEOUT, logger=None, http_client=None):
         self.urls = urls
         self.timeout = timeout
         self.logger = logger or logging.getLogger(__name__)
+        # 共享长连接和 TLS 会话，隧道中重复检测时无需每次完整握手
+        self.http = http_client or get_http_client()
 
     def _is_ssl_fatal_error(self, error):
         """判断是否为致命SSL错误（浏览器会阻断的情况）"""
@@ -41,23 +49,17 @@ class ConnectivityChecker:
         """检测单个URL连通性"""
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Connection": "close",
         }
 
         method = "HEAD" if "generate_204" in url else "GET"
 
         try:
             req = Request(url, headers=headers, method=method)
-            ctx = ssl.create_default_context()
 
             # 添加替代 CA 或关闭校验调试用途（可选）
-            # ctx.load_verify_locations(cafile="/path/to/custom-ca.pem")
-            # ctx.load_verify_locations(cafile="/home/sinspire/test.pem")
-
-            ctx.check_hostname = True
-            ctx.verify_mode = ssl.CERT_REQUIRED
+            # self.http.ssl_context().load_verify_locations(cafile="/path/to/custom-ca.pem")
 
-            with urlopen(req, timeout=self.timeout, context=ctx) as resp:
+            with self.http.open(req, timeout=self.timeout) as resp:
                 status = resp.getcode()
                 if "generate_204" in url:
                     if status == 204:
@@ -0,0 +1,763 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+try:
+    from .module_http import get_http_client
+except ImportError:
+    # 作为脚本运行时的绝对导入
+    from module_http import get_http_client
+
+# 列表有效性校验: CSV 表头以及最少数据行数
+LIST_HEADER_PREFIX = b"#HostName"
+MIN_LIST_ROWS = 10
+
+# 列表下载时协商的压缩方式，安装了 brotli 时额外支持 br
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+# 预压缩的 .gz 列表不可用时，在此时长内不再尝试
+COMPRESSED_RETRY_AFTER = 24 * 3600  # second
+
+# 常见本地代理端口，按优先级排列
+COMMON_PROXY_PORTS = ["7890", "10809", "10808"]
+# 会被检查的代理环境变量
+PROXY_ENV_VARS = [
+    "HTTPS_PROXY",
+    "https_proxy",
+    "HTTP_PROXY",
+    "http_proxy",
+    "ALL_PROXY",
+    "all_proxy",
+]
+
+
+class ListCache:
+    """本地服务器列表缓存及其 HTTP 校验信息 (ETag / Last-Modified / 内容哈希)"""
+
+    def __init__(self, csv_path, logger=None):
+        self.csv_path = csv_path
+        self.meta_path = csv_path + ".meta.json"
+        self.log = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.meta = self._load_meta()
+        # 最近一次 stream() 的结果: None 未完成, True 内容已更新, False 内容未变
+        self.changed = None
+
+    def _load_meta(self):
+        """读取校验信息，文件缺失或损坏时返回空记录"""
+        meta = {"sha256": None, "sources": {}, "compressed_missing": {}}
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                meta["sha256"] = data.get("sha256")
+                meta["sources"] = dict(data.get("sources") or {})
+                meta["compressed_missing"] = dict(data.get("compressed_missing") or {})
+        except (IOError, OSError, ValueError):
+            pass
+        return meta
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.meta, f, indent=2)
+                os.replace(tmp_path, self.meta_path)
+            except (IOError, OSError) as e:
+                self.log.debug(f"Failed to save list validators: {e}")
+
+    def compressed_missing(self, source_key):
+        """该来源最近没有提供预压缩的 .gz 列表"""
+        missing_at = self.meta["compressed_missing"].get(source_key, 0)
+        return time.time() - missing_at < COMPRESSED_RETRY_AFTER
+
+    def mark_compressed_missing(self, source_key):
+        self.meta["compressed_missing"][source_key] = time.time()
+        self._save_meta()
+
+    def conditional_headers(self, source_key):
+        """返回某个来源的条件请求头，本地无缓存时不发送校验信息"""
+        if not os.path.exists(self.csv_path):
+            return {}
+        validators = self.meta["sources"].get(source_key, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def touch(self):
+        """服务器返回 304 时仅刷新缓存文件的修改时间"""
+        now = time.time()
+        os.utime(self.csv_path, (now, now))
+
+    def stream(
+        self, source_key, response, prefix=b"", chunk_size=64 * 1024, min_size=1000
+    ):
+        """边下载边按行产出列表内容，下载完整且校验通过后再替换缓存文件
+
+        ``prefix`` holds bytes already read from ``response`` (e.g. while the
+        source was being validated); they are emitted before the rest.
+
+        Yields:
+            str: Decoded text lines (with line endings) as soon as they arrive.
+
+        Raises:
+            ValueError: if the finished download is too small to be a valid list.
+        """
+        tmp_path = self.csv_path + ".part"
+        hasher = hashlib.sha256()
+        size = 0
+        pending = b""
+        complete = False
+        self.changed = None
+        read = getattr(response, "read1", response.read)
+        try:
+            with response, open(tmp_path, "wb") as f:
+                chunk = prefix
+                while True:
+                    if not chunk:
+                        chunk = read(chunk_size)
+                        if not chunk:
+                            break
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    *lines, pending = (pending + chunk).split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8", errors="replace") + "\n"
+                    chunk = b""
+                if pending:
+                    yield pending.decode("utf-8", errors="replace")
+
+            if size < min_size:
+                raise ValueError(f"VPN list too small ({size} bytes)")
+            complete = True
+            self.changed = self._commit(
+                tmp_path, hasher.hexdigest(), source_key, response.headers
+            )
+        finally:
+            if not complete and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _commit(self, tmp_path, digest, source_key, response_headers):
+        """用下载完成的临时文件替换缓存，并记录校验信息
+
+        Returns:
+            bool: True if the list content changed, False if only the mtime was refreshed.
+        """
+        changed = not (
+            digest == self.meta.get("sha256") and os.path.exists(self.csv_path)
+        )
+        if changed:
+            os.replace(tmp_path, self.csv_path)
+        else:
+            os.remove(tmp_path)
+            self.touch()
+
+        validators = {}
+        if response_headers is not None:
+            if response_headers.get("ETag"):
+                validators["etag"] = response_headers.get("ETag")
+            if response_headers.get("Last-Modified"):
+                validators["last_modified"] = response_headers.get("Last-Modified")
+        if changed:
+            # 其他来源的校验信息对应旧内容，保留会让它们以 304 确认一份并非由其提供的缓存
+            self.meta["sources"] = {}
+        self.meta["sha256"] = digest
+        self.meta["sources"][source_key] = validators
+        self._save_meta()
+        return changed
+
+
+class ListDownload:
+    """在独立线程中将列表下载到缓存文件，下载到的行经队列交给读取方
+
+    Reading the lines (e.g. a paused probe sweep) never holds back the
+    transfer itself.
+    """
+
+    _END = object()
+
+    def __init__(self, list_cache, source_key, response, prefix=b"", on_done=None):
+        self.list_cache = list_cache
+        self.on_done = on_done
+        # 下载失败时的异常，读取方读完已收到的行后抛出
+        self.error = None
+        self.done = threading.Event()
+        self._lines = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, args=(source_key, response, prefix), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, source_key, response, prefix):
+        try:
+            for line in self.list_cache.stream(source_key, response, prefix):
+                self._lines.put(line)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+            self._lines.put(self._END)
+            if self.on_done is not None:
+                self.on_done()
+
+    def __iter__(self):
+        """按到达顺序产出行，下载失败时在最后抛出其异常"""
+        while True:
+            line = self._lines.get()
+            if line is self._END:
+                break
+            yield line
+        if self.error is not None:
+            raise self.error
+
+
+class _Decompressor:
+    """gzip / deflate / br 的增量解压器"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        # 按标准 deflate 应为 zlib 格式，部分服务器发送裸 deflate，首块失败时再切换
+        self._raw_fallback = encoding == "deflate"
+        if encoding in ("gzip", "x-gzip"):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._obj = zlib.decompressobj()
+        elif encoding == "br" and brotli is not None:
+            self._obj = brotli.Decompressor()
+        else:
+            raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+    def decompress(self, data):
+        if self.encoding == "br":
+            return self._obj.process(data)
+        try:
+            return self._obj.decompress(data)
+        except zlib.error:
+            if not self._raw_fallback:
+                raise
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data)
+        finally:
+            # 只有首块允许回退
+            self._raw_fallback = False
+
+    def flush(self):
+        if self.encoding == "br":
+            return b""
+        return self._obj.flush()
+
+
+class DecodedResponse:
+    """对压缩响应体进行流式解压，提供与 HTTPResponse 相同的读取接口"""
+
+    def __init__(self, response, encoding):
+        self.response = response
+        self.headers = response.headers
+        self._decompressor = _Decompressor(encoding)
+        self._read = getattr(response, "read1", response.read)
+        self._eof = False
+
+    @classmethod
+    def wrap(cls, response, url):
+        """按 Content-Encoding (或 .gz 后缀) 包装响应，未压缩时原样返回"""
+        encoding = (response.headers.get("Content-Encoding") or "").strip().lower()
+        if encoding in ("", "identity"):
+            if urllib.parse.urlsplit(url).path.endswith(".gz"):
+                encoding = "gzip"
+            else:
+                return response
+        return cls(response, encoding)
+
+    def read1(self, size=-1):
+        while not self._eof:
+            raw = self._read(size)
+            if not raw:
+                self._eof = True
+                return self._decompressor.flush()
+            data = self._decompressor.decompress(raw)
+            if data:
+                return data
+        return b""
+
+    read = read1
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MirrorTable:
+    """持久化的镜像健康表: 记录每个镜像的延迟、成功率和最近失败时间
+
+    失败的镜像按指数退避暂时跳过，其余镜像按成功率和延迟排序。
+    """
+
+    BACKOFF_BASE = 60  # second
+    BACKOFF_MAX = 24 * 3600  # second
+    LATENCY_ALPHA = 0.3  # 延迟指数移动平均的权重
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.log = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.mirrors = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except (IOError, OSError, ValueError):
+            pass
+        return {}
+
+    def _entry(self, mirror):
+        return self.mirrors.setdefault(
+            mirror,
+            {
+                "latency": None,
+                "successes": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "last_success": None,
+                "last_failure": None,
+                "backoff_until": 0,
+            },
+        )
+
+    def record(self, mirror, ok, latency=None):
+        """记录一次请求结果，并在后台保存"""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(mirror)
+            if ok:
+                entry["successes"] += 1
+                entry["consecutive_failures"] = 0
+                entry["last_success"] = now
+                entry["backoff_until"] = 0
+                if latency is not None:
+                    if entry["latency"] is None:
+                        entry["latency"] = latency
+                    else:
+                        entry["latency"] += self.LATENCY_ALPHA * (
+                            latency - entry["latency"]
+                        )
+            else:
+                entry["failures"] += 1
+                entry["consecutive_failures"] += 1
+                entry["last_failure"] = now
+                backoff = min(
+                    self.BACKOFF_BASE * 2 ** (entry["consecutive_failures"] - 1),
+                    self.BACKOFF_MAX,
+                )
+                entry["backoff_until"] = now + backoff
+        self.save_async()
+
+    def success_rate(self, mirror):
+        entry = self.mirrors.get(mirror)
+        if not entry:
+            return 0.5
+        # 拉普拉斯平滑，未知镜像视为 50%
+        return (entry["successes"] + 1) / (entry["successes"] + entry["failures"] + 2)
+
+    def is_backed_off(self, mirror, now=None):
+        entry = self.mirrors.get(mirror)
+        return bool(entry) and entry["backoff_until"] > (now or time.time())
+
+    def ranked(self, mirrors):
+        """按健康状况排序镜像，退避中的镜像排在最后"""
+        now = time.time()
+
+        def rank_key(mirror):
+            entry = self.mirrors.get(mirror) or {}
+            latency = entry.get("latency")
+            return (
+                self.is_backed_off(mirror, now),
+                -self.success_rate(mirror),
+                latency if latency is not None else float("inf"),
+            )
+
+        return sorted(mirrors, key=rank_key)
+
+    def save(self):
+        # 串行化写入，保证后保存的总是较新的快照
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.mirrors, indent=2)
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except (IOError, OSError) as e:
+                self.log.debug(f"Failed to save mirror table: {e}")
+
+    def save_async(self):
+        threading.Thread(target=self.save, daemon=True).start()
+
+
+class ProxyDiscovery:
+    """并发探测本地代理端口和代理环境变量，并记住上次可用的代理
+
+    发现的代理只作为单次请求的参数传给 HttpClient，不修改全局 urllib 状态。
+    """
+
+    def __init__(self, cache_path, ports=None, timeout=0.3, logger=None):
+        self.cache_path = cache_path
+        self.ports = list(ports or COMMON_PROXY_PORTS)
+        self.timeout = timeout
+        self.log = logger or logging.getLogger(__name__)
+
+    def _load_last(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("proxy")
+        except (IOError, OSError, ValueError, AttributeError):
+            return None
+
+    def remember(self, proxy_url):
+        """记录可用代理，下次启动时优先检测"""
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({"proxy": proxy_url, "time": time.time()}, f)
+        except (IOError, OSError) as e:
+            self.log.debug(f"Failed to save proxy cache: {e}")
+
+    def candidates(self):
+        """按优先级返回候选代理: 上次可用 > 环境变量 > 常见端口"""
+        candidates = []
+        last = self._load_last()
+        if last:
+            candidates.append(last)
+        for name in PROXY_ENV_VARS:
+            value = os.environ.get(name)
+            if not value:
+                continue
+            if "://" not in value:
+                value = f"http://{value}"
+            if urllib.parse.urlsplit(value).scheme not in ("http", "https"):
+                # urllib 不支持 socks 等代理协议
+                self.log.debug(f"Ignoring unsupported proxy {name}={value}")
+                continue
+            candidates.append(value)
+        candidates.extend(f"http://127.0.0.1:{port}" for port in self.ports)
+        # 去重并保持顺序
+        return list(dict.fromkeys(candidates))
+
+    def _is_reachable(self, proxy_url):
+        parts = urllib.parse.urlsplit(proxy_url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            with socket.create_connection(
+                (parts.hostname, port), timeout=self.timeout
+            ):
+                return True
+        except (OSError, ValueError):
+            return False
+
+    def discover(self):
+        """同时检测所有候选代理，返回优先级最高的可用代理 URL 或 None"""
+        candidates = self.candidates()
+        reachable = [False] * len(candidates)
+
+        def check(index):
+            reachable[index] = self._is_reachable(candidates[index])
+
+        threads = [
+            threading.Thread(target=check, args=(i,), daemon=True)
+            for i in range(len(candidates))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.timeout + 0.5)
+
+        for proxy_url, ok in zip(candidates, reachable):
+            if ok:
+                return proxy_url
+        return None
+
+
+class ListSource:
+    """一个可下载服务器列表的来源"""
+
+    def __init__(
+        self,
+        name,
+        url,
+        source_key,
+        proxy_url=None,
+        timeout=10,
+        mirror=None,
+        compressed_url=None,
+    ):
+        self.name = name
+        self.url = url
+        # 预压缩的 .gz 列表地址，可用时优先下载
+        self.compressed_url = compressed_url
+        # 条件请求校验信息的键，同一上游文件的不同镜像共用
+        self.source_key = source_key
+        # 经由代理下载时的代理地址，None 表示直连
+        self.proxy_url = proxy_url
+        self.timeout = timeout
+        # 在 MirrorTable 中记录健康状况的镜像键，None 表示不记录
+        self.mirror = mirror
+
+    def __repr__(self):
+        return f"ListSource({self.name!r}, {self.url!r})"
+
+
+class RaceResult:
+    """竞速结果: 胜出的来源及其已读取的前缀和响应"""
+
+    def __init__(
+        self, source, response=None, prefix=b"", not_modified=False, source_key=None
+    ):
+        self.source = source
+        # 实际使用的校验信息键 (预压缩文件有自己的 ETag)
+        self.source_key = source_key or source.source_key
+        self.response = response
+        self.prefix = prefix
+        self.not_modified = not_modified
+        self.elapsed = 0.0
+
+
+class ListSourceRacer:
+    """并发 (按对冲延迟错开) 请求多个列表来源，取第一个通过校验的来源，取消其余请求"""
+
+    def __init__(
+        self,
+        list_cache,
+        hedge_delay=0.3,
+        min_rows=MIN_LIST_ROWS,
+        deadline=60,
+        mirror_table=None,
+        http_client=None,
+        logger=None,
+    ):
+        self.list_cache = list_cache
+        self.http = http_client or get_http_client()
+        self.mirror_table = mirror_table
+        self.hedge_delay = hedge_delay
+        self.min_rows = min_rows
+        self.deadline = deadline
+        self.log = logger or logging.getLogger(__name__)
+        self._done = threading.Event()
+        self._results = queue.Queue()
+        # 失败的镜像在本轮有来源成功后才记入 MirrorTable
+        self._failed = []
+        self._failed_lock = threading.Lock()
+
+    def _is_valid_prefix(self, data):
+        """表头存在且其后至少有 min_rows 行数据"""
+        header_at = data.find(LIST_HEADER_PREFIX)
+        if header_at < 0:
+            return False
+        rows = 0
+        for line in data[header_at:].split(b"\n")[1:-1]:
+            if line.strip() and not line.startswith(b"*"):
+                rows += 1
+                if rows >= self.min_rows:
+                    return True
+        return False
+
+    def _record(self, source, ok, elapsed=None):
+        if self.mirror_table is None or not source.mirror:
+            return
+        if ok:
+            self.mirror_table.record(source.mirror, True, elapsed)
+            return
+        with self._failed_lock:
+            if not self._done.is_set():
+                self._failed.append(source)
+
+    def _record_failures(self, winner):
+        """有来源成功时记录失败的镜像；全部失败多半是本地网络问题，不归咎于镜像"""
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        if winner is None:
+            if failed:
+                self.log.debug(
+                    f"No list source succeeded, not recording {len(failed)} "
+                    "mirror failures"
+                )
+            return
+        for source in failed:
+            self.mirror_table.record(source.mirror, False)
+
+    def _request(self, source, url, source_key):
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        headers.update(self.list_cache.conditional_headers(source_key))
+        req = urllib.request.Request(url, headers=headers)
+        response = self.http.open(req, timeout=source.timeout, proxy=source.proxy_url)
+        return DecodedResponse.wrap(response, url)
+
+    def _open(self, source):
+        """打开来源，优先下载预压缩的 .gz 列表
+
+        Returns:
+            (response, source_key) tuple; HTTP errors are raised as HTTPError.
+        """
+        if source.compressed_url and not self.list_cache.compressed_missing(
+            source.source_key
+        ):
+            source_key = source.source_key + ".gz"
+            try:
+                return (
+                    self._request(source, source.compressed_url, source_key),
+                    source_key,
+                )
+            except urllib.error.HTTPError as e:
+                if e.code != 404:
+                    raise
+                self.list_cache.mark_compressed_missing(source.source_key)
+        return (
+            self._request(source, source.url, source.source_key),
+            source.source_key,
+        )
+
+    def _fetch(self, source):
+        """在工作线程中打开来源并读取到足以校验的前缀"""
+        start = time.time()
+        try:
+            response, source_key = self._open(source)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                result = RaceResult(source, not_modified=True)
+                result.elapsed = time.time() - start
+                self._record(source, True, result.elapsed)
+                self._results.put((True, result))
+            else:
+                self.log.debug(f"{source.name}: HTTP {e.code}")
+                self._record(source, False)
+                self._results.put((False, source))
+            return
+        except Exception as e:
+            self.log.debug(f"{source.name}: {type(e).__name__}: {e}")
+            self._record(source, False)
+            self._results.put((False, source))
+            return
+
+        prefix = b""
+        read = getattr(response, "read1", response.read)
+        try:
+            while not self._done.is_set() and not self._is_valid_prefix(prefix):
+                chunk = read(16 * 1024)
+                if not chunk:
+                    break
+                prefix += chunk
+        except Exception as e:
+            self.log.debug(f"{source.name}: {type(e).__name__}: {e}")
+            response.close()
+            self._record(source, False)
+            self._results.put((False, source))
+            return
+
+        if self._done.is_set():
+            # 已有胜出者，关闭连接
+            response.close()
+            self._results.put((False, source))
+            return
+
+        if not self._is_valid_prefix(prefix):
+            # 内容无效 (如镜像返回的错误页面)
+            response.close()
+            self._record(source, False)
+            self._results.put((False, source))
+            return
+
+        result = RaceResult(source, response, prefix, source_key=source_key)
+        result.elapsed = time.time() - start
+        self._record(source, True, result.elapsed)
+        self._results.put((True, result))
+
+    def _order(self, sources):
+        """镜像来源按 MirrorTable 中的健康状况重新排序并跳过退避中的镜像，其他来源位置不变"""
+        if self.mirror_table is None:
+            return list(sources)
+        mirrors = [source for source in sources if source.mirror]
+        ranked = iter(self.mirror_table.ranked([source.mirror for source in mirrors]))
+        by_mirror = {source.mirror: source for source in mirrors}
+        ordered = []
+        for source in sources:
+            if source.mirror:
+                source = by_mirror[next(ranked)]
+                if self.mirror_table.is_backed_off(source.mirror):
+                    self.log.debug(
+                        f"Skipping list source {source.name}, it failed recently"
+                    )
+                    continue
+            ordered.append(source)
+        return ordered
+
+    def race(self, sources):
+        """返回第一个有效来源的 RaceResult，全部失败时返回 None"""
+        pending = self._order(sources)
+        running = 0
+        next_start = time.time()
+        deadline = time.time() + self.deadline
+        winner = None
+
+        while pending or running:
+            now = time.time()
+            if now > deadline:
+                break
+            if pending and (now >= next_start or running == 0):
+                source = pending.pop(0)
+                self.log.debug(f"Racing list source {source.name}: {source.url}")
+                threading.Thread(target=self._fetch, args=(source,), daemon=True).start()
+                running += 1
+                next_start = now + self.hedge_delay
+                continue
+
+            wait = (next_start - now) if pending else (deadline - now)
+            try:
+                ok, result = self._results.get(timeout=max(0.01, wait))
+            except queue.Empty:
+                continue
+            running -= 1
+            if ok:
+                winner = result
+                break
+            # 失败的来源立即触发下一个来源，不必等待对冲延迟
+            next_start = time.time()
+
+        self._done.set()
+        self._record_failures(winner)
+        # 关闭在胜出者之后才完成校验的响应
+        threading.Thread(target=self._drain, args=(running,), daemon=True).start()
+        return winner
+
+    def _drain(self, running):
+        for _ in range(running):
+            try:
+                ok, result = self._results.get(timeout=self.deadline)
+            except queue.Empty:
+                return
+            if ok and result.response is not None:
+                result.response.close()
@@ -0,0 +1,331 @@
+import http.client
+import logging
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# 每个主机保留的空闲连接数
+MAX_IDLE_PER_HOST = 4
+# 空闲连接的最长保留时间，超过后不再复用
+IDLE_TIMEOUT = 60  # second
+# 关闭未读完的响应时，剩余内容不超过该大小则读完以便复用连接
+DRAIN_LIMIT = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    """握手时复用同一主机上次的 TLS 会话"""
+
+    def __init__(self, host, port=None, session_cache=None, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self._session_cache = session_cache
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        session = None
+        if self._session_cache is not None:
+            session = self._session_cache.get(server_hostname)
+        try:
+            self.sock = self._context.wrap_socket(
+                self.sock, server_hostname=server_hostname, session=session
+            )
+        except ValueError:
+            # 会话不属于该 SSLContext 或已失效。原套接字此时已被 wrap_socket 取走，
+            # 不能再用: 关闭后重新连接，再完整握手
+            self.sock.close()
+            http.client.HTTPConnection.connect(self)
+            self.sock = self._context.wrap_socket(
+                self.sock, server_hostname=server_hostname
+            )
+
+
+class _TLSSessionCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def get(self, hostname):
+        with self._lock:
+            return self._sessions.get(hostname)
+
+    def put(self, hostname, session):
+        with self._lock:
+            self._sessions[hostname] = session
+
+
+class PooledResponse:
+    """http.client 响应的包装，关闭时将连接归还连接池
+
+    提供与 urlopen() 返回值相同的常用接口 (status / headers / read / read1 / geturl)。
+    """
+
+    def __init__(self, client, key, conn, response, url):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.will_close = response.will_close
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def read(self, amt=None):
+        return self._response.read(amt)
+
+    def read1(self, n=-1):
+        return self._response.read1(n)
+
+    def readline(self, limit=-1):
+        return self._response.readline(limit)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        response = self._response
+        if not response.isclosed() and not self.will_close:
+            # 剩余内容较少时读完，使连接可以复用
+            remaining = response.length
+            if remaining is not None and remaining <= DRAIN_LIMIT:
+                try:
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    pass
+        if response.isclosed() and not self.will_close:
+            self._client._release(self._key, conn)
+        else:
+            response.close()
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpClient:
+    """共享的 HTTP 客户端: 按主机保持长连接、复用 TLS 会话、共用一个 SSLContext
+
+    连接池对隧道变化敏感: 复用空闲连接前检查到达对端的本地源地址，
+    VPN 建立或断开导致路由变化时丢弃旧连接。
+    """
+
+    def __init__(self, logger=None):
+        self.log = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # (scheme, host, port, proxy) -> [(conn, last_used), ...]
+        self._idle = {}
+        self._context = None
+        self._sessions = _TLSSessionCache()
+
+    def ssl_context(self):
+        """返回共用的 SSLContext (校验证书)"""
+        with self._lock:
+            if self._context is None:
+                self._context = ssl.create_default_context()
+            return self._context
+
+    def reset(self):
+        """关闭所有空闲连接 (如 VPN 连接建立或断开后)"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    @staticmethod
+    def _route_source(sock):
+        """返回当前路由到该连接对端时使用的本地地址，无路由时返回 None"""
+        try:
+            peer = sock.getpeername()
+            with socket.socket(sock.family, socket.SOCK_DGRAM) as probe:
+                # UDP connect 只查询路由，不发送数据
+                probe.connect(peer[:2])
+                return probe.getsockname()[0]
+        except OSError:
+            return None
+
+    def _is_reusable(self, conn, last_used):
+        if time.time() - last_used > IDLE_TIMEOUT or conn.sock is None:
+            return False
+        try:
+            local = conn.sock.getsockname()[0]
+        except OSError:
+            return False
+        if self._route_source(conn.sock) != local:
+            self.log.debug(f"Route to {conn.host} changed, dropping pooled connection")
+            return False
+        return True
+
+    def _acquire(self, key):
+        while True:
+            with self._lock:
+                conns = self._idle.get(key)
+                if not conns:
+                    return None
+                conn, last_used = conns.pop()
+            if self._is_reusable(conn, last_used):
+                return conn
+            conn.close()
+
+    def _release(self, key, conn):
+        sock = conn.sock
+        if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+            hostname = conn._tunnel_host or conn.host
+            self._sessions.put(hostname, sock.session)
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < MAX_IDLE_PER_HOST:
+                conns.append((conn, time.time()))
+                return
+        conn.close()
+
+    def _new_connection(self, key, timeout):
+        scheme, host, port, proxy = key
+        if proxy:
+            proxy_parts = urllib.parse.urlsplit(proxy)
+            proxy_port = proxy_parts.port or (
+                443 if proxy_parts.scheme == "https" else 80
+            )
+            if scheme == "https":
+                conn = _HTTPSConnection(
+                    proxy_parts.hostname,
+                    proxy_port,
+                    session_cache=self._sessions,
+                    timeout=timeout,
+                    context=self.ssl_context(),
+                )
+                conn.set_tunnel(host, port)
+            else:
+                conn = http.client.HTTPConnection(
+                    proxy_parts.hostname, proxy_port, timeout=timeout
+                )
+        elif scheme == "https":
+            conn = _HTTPSConnection(
+                host,
+                port,
+                session_cache=self._sessions,
+                timeout=timeout,
+                context=self.ssl_context(),
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn
+
+    def _send(self, key, method, url, headers, timeout, body=None):
+        """在池中连接或新连接上发送请求，复用的连接已被对端关闭时换新连接重试一次"""
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        if key[3] and parts.scheme == "http":
+            # 经由 HTTP 代理的明文请求使用绝对 URL
+            target = urllib.parse.urlunsplit(parts._replace(fragment=""))
+
+        conn = self._acquire(key)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._new_connection(key, timeout)
+            else:
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                conn.close()
+                if not reused:
+                    raise
+                reused = False
+                conn = None
+            except BaseException:
+                conn.close()
+                raise
+
+    def open(self, request, timeout=10, proxy=None):
+        """发送请求并返回 PooledResponse
+
+        Accepts a URL string or urllib.request.Request. Like urlopen(),
+        redirects are followed, HTTP errors (including 304) are raised as
+        urllib.error.HTTPError and connection errors as urllib.error.URLError.
+        """
+        if isinstance(request, str):
+            request = urllib.request.Request(request)
+        url = request.full_url
+        method = request.get_method()
+        body = request.data
+        headers = {"Connection": "keep-alive"}
+        if body is not None:
+            # 与 urlopen() 相同的默认类型
+            headers["Content-type"] = "application/x-www-form-urlencoded"
+        headers.update(request.header_items())
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ("http", "https"):
+                raise urllib.error.URLError(f"unknown url type: {parts.scheme}")
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            key = (parts.scheme, parts.hostname, port, proxy)
+            try:
+                conn, response = self._send(key, method, url, headers, timeout, body)
+            except (OSError, http.client.HTTPException) as e:
+                raise urllib.error.URLError(e) from e
+            result = PooledResponse(self, key, conn, response, url)
+
+            location = response.getheader("Location")
+            if response.status in REDIRECT_CODES and location:
+                result.close()
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303 or (
+                    response.status in (301, 302) and method == "POST"
+                ):
+                    # 与浏览器和 urlopen() 一样改为不带请求体的 GET
+                    method = "GET"
+                    body = None
+                    headers.pop("Content-type", None)
+                continue
+            if response.status >= 400 or response.status == 304:
+                result.close()
+                raise urllib.error.HTTPError(
+                    url, response.status, response.reason, response.headers, None
+                )
+            return result
+
+        raise urllib.error.HTTPError(
+            url, response.status, "Too many redirects", response.headers, None
+        )
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """返回进程内共享的 HttpClient"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
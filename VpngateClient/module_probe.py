@@ -0,0 +1,731 @@
+import asyncio
+import collections
+import errno
+import logging
+import os
+import math
+import socket
+import statistics
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，不做文件描述符限制
+    resource = None
+
+# 同时进行的探测数上限
+DEFAULT_PROBE_CONCURRENCY = 500
+# 自适应并发 (AIMD): 初始窗口、窗口下限、每轮增加量，以及超时率超出基线多少时窗口减半
+INITIAL_PROBE_WINDOW = 100
+MIN_PROBE_WINDOW = 8
+PROBE_WINDOW_STEP = 32
+TIMEOUT_RATE_MARGIN = 0.1
+# 两轮探测: 第一轮超时为近期响应时间 p95 的 HEDGE_FACTOR 倍 (不低于 HEDGE_MIN_TIMEOUT)，
+# 响应数不足 HEDGE_MIN_SAMPLES 时使用 HEDGE_INITIAL_TIMEOUT
+HEDGE_FACTOR = 3.0
+HEDGE_MIN_TIMEOUT = 0.2  # second
+HEDGE_INITIAL_TIMEOUT = 1.0  # second
+HEDGE_MIN_SAMPLES = 20
+HEDGE_LATENCY_WINDOW = 256
+# 暂停期间 (连接尝试时) 检查是否已恢复的间隔
+PAUSE_POLL_INTERVAL = 0.2  # second
+# 为探测以外的文件和连接保留的文件描述符数
+FD_RESERVE = 64
+# 本地资源耗尽 (文件描述符、端口、缓冲区) 的错误，出现时立即减小窗口
+LOCAL_ERRNOS = {
+    errno.EMFILE,
+    errno.ENFILE,
+    errno.ENOBUFS,
+    errno.ENOMEM,
+    errno.EADDRNOTAVAIL,
+}
+
+# 单次探测的结果类型，供并发窗口调整使用
+PROBE_OK = "ok"
+PROBE_TIMEOUT = "timeout"
+PROBE_FAILED = "failed"
+PROBE_LOCAL_ERROR = "local_error"
+# 多次采样时相邻两次采样的间隔
+DEFAULT_SAMPLE_INTERVAL = 0.25  # second
+# 再采样的超时为首次往返时间的 SAMPLE_TIMEOUT_FACTOR 倍，不低于 MIN_SAMPLE_TIMEOUT
+SAMPLE_TIMEOUT_FACTOR = 3.0
+MIN_SAMPLE_TIMEOUT = 0.2  # second
+# 排序时每 100% 丢包附加的延迟，约为 TCP SYN 的初始重传超时
+LOSS_PENALTY = 1000  # ms
+
+# OpenVPN 控制通道操作码 (首字节高 5 位，低 3 位为 key_id)
+P_CONTROL_HARD_RESET_CLIENT_V2 = 7
+P_CONTROL_HARD_RESET_SERVER_V2 = 8
+
+# HARD_RESET_SERVER 应答的合理长度范围，超出时不是 OpenVPN
+# (操作码 1 + 会话 ID 8 + ACK 数组长度 1 + ACK 4 + 对端会话 ID 8 + 消息包 ID 4)
+MIN_REPLY_SIZE = 26
+MAX_REPLY_SIZE = 1500
+
+_DONE = object()
+
+
+class ProbeResult:
+    """一个端点的探测结果，可包含多次采样
+
+    Samples are the connect RTT for TCP and the handshake RTT for UDP, in ms;
+    a lost sample counts towards ``loss``. ``handshake`` is the time from the
+    OpenVPN hard reset to the server's reply, None when it was not checked.
+    A result that is not ``conclusive`` only timed out in the short first
+    pass of a hedged sweep and was never probed with the full timeout.
+    A ``partial`` result holds the first sample only; the same item follows
+    again with all its samples.
+    """
+
+    __slots__ = (
+        "responding",
+        "samples",
+        "lost",
+        "handshake",
+        "conclusive",
+        "partial",
+    )
+
+    def __init__(
+        self, responding, latency=float("inf"), handshake=None, conclusive=True
+    ):
+        self.responding = responding
+        self.samples = [latency] if responding else []
+        self.lost = 0
+        self.handshake = handshake
+        self.conclusive = conclusive
+        self.partial = False
+
+    @classmethod
+    def from_samples(cls, samples, lost=0, handshake=None):
+        """由保存的采样重建结果 (如探测缓存)，samples 为空表示无响应"""
+        if not samples:
+            return cls(False)
+        result = cls(True, samples[0], handshake)
+        result.samples.extend(samples[1:])
+        result.lost = lost
+        return result
+
+    def add_sample(self, latency):
+        """加入一次采样，latency 为 None 表示丢失"""
+        if latency is None:
+            self.lost += 1
+        else:
+            self.samples.append(latency)
+
+    @property
+    def loss(self):
+        total = len(self.samples) + self.lost
+        return self.lost / total if total else 1.0
+
+    @property
+    def rtt_min(self):
+        return min(self.samples, default=float("inf"))
+
+    @property
+    def median(self):
+        return statistics.median(self.samples) if self.samples else float("inf")
+
+    @property
+    def p90(self):
+        if not self.samples:
+            return float("inf")
+        ordered = sorted(self.samples)
+        return ordered[math.ceil(0.9 * len(ordered)) - 1]
+
+    @property
+    def jitter(self):
+        """相邻采样之差的平均绝对值 (与 RFC 3550 的抖动含义相同)"""
+        if len(self.samples) < 2:
+            return 0.0
+        return statistics.mean(
+            abs(b - a) for a, b in zip(self.samples, self.samples[1:])
+        )
+
+    @property
+    def latency(self):
+        """排序用的延迟: 采样中位数加上按丢包率计算的惩罚"""
+        if not self.responding:
+            return float("inf")
+        return self.median + self.loss * LOSS_PENALTY
+
+    def __repr__(self):
+        return (
+            f"ProbeResult(responding={self.responding}, latency={self.latency:.1f}, "
+            f"samples={len(self.samples) + self.lost}, loss={self.loss:.0%}, "
+            f"handshake={self.handshake})"
+        )
+
+
+def hard_reset_packet():
+    """构造 OpenVPN 的 P_CONTROL_HARD_RESET_CLIENT_V2 包 (不含 tls-auth / tls-crypt)
+
+    Returns:
+        tuple: ``(packet, session_id)``.
+    """
+    session_id = os.urandom(8)
+    # 操作码 | 本端会话 ID | ACK 数组长度 0 | 消息包 ID 0
+    packet = bytes([P_CONTROL_HARD_RESET_CLIENT_V2 << 3]) + session_id + bytes(5)
+    return packet, session_id
+
+
+def frame_tcp_packet(packet):
+    """OpenVPN over TCP 的包以 2 字节长度 (大端) 为前缀"""
+    return len(packet).to_bytes(2, "big") + packet
+
+
+def is_hard_reset_reply(data, session_id):
+    """data 是否为服务器对 session_id 的 P_CONTROL_HARD_RESET_SERVER_V2 应答"""
+    if len(data) < MIN_REPLY_SIZE or data[0] >> 3 != P_CONTROL_HARD_RESET_SERVER_V2:
+        return False
+    # 服务器的应答必须确认本端的 HARD_RESET_CLIENT，没有 ACK 数组时无法确认会话
+    acks = data[9]
+    if not acks:
+        return False
+    # ACK 数组之后是被确认的对端 (即本端) 会话 ID
+    offset = 10 + 4 * acks
+    return data[offset : offset + 8] == session_id
+
+
+class _HardResetProtocol(asyncio.DatagramProtocol):
+    """等待服务器的 HARD_RESET_SERVER 应答，收到时记录时间"""
+
+    def __init__(self, session_id, reply):
+        self.session_id = session_id
+        self.reply = reply
+
+    def datagram_received(self, data, addr):
+        if not self.reply.done() and is_hard_reset_reply(data, self.session_id):
+            self.reply.set_result(time.monotonic())
+
+    def error_received(self, exc):
+        # 如 ICMP 端口不可达
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+    def connection_lost(self, exc):
+        if not self.reply.done():
+            self.reply.set_exception(exc or ConnectionAbortedError("closed"))
+
+
+def probe_fd_limit(wanted):
+    """可同时用于探测的文件描述符数，必要时先提高软限制，无法确定时返回 None"""
+    if resource is None:
+        return None
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (OSError, ValueError):
+        return None
+    need = wanted + FD_RESERVE
+    if soft != resource.RLIM_INFINITY and soft < need:
+        raised = need if hard == resource.RLIM_INFINITY else min(need, hard)
+        if raised > soft:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (raised, hard))
+                soft = raised
+            except (OSError, ValueError):
+                pass
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return max(1, soft - FD_RESERVE)
+
+
+class _Cohort:
+    """同一批启动的探测，全部完成后按其超时率调整窗口"""
+
+    __slots__ = ("generation", "size", "done", "timeouts")
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.size = 0
+        self.done = 0
+        self.timeouts = 0
+
+
+class AdaptiveWindow:
+    """探测的并发窗口 (AIMD): 成功时加性增加，一批探测的超时率明显高于基线或出现本地资源错误时减半"""
+
+    def __init__(self, initial, maximum, adaptive=True):
+        self.maximum = max(1, maximum)
+        self.minimum = min(MIN_PROBE_WINDOW, self.maximum)
+        self.adaptive = adaptive
+        if not adaptive:
+            initial = self.maximum
+        self.window = float(max(self.minimum, min(initial, self.maximum)))
+        self.in_flight = 0
+        self.peak = 0
+        self.decreases = 0
+        self.baseline = None
+        self._generation = 0
+        self._cohort = None
+        self._waiters = collections.deque()
+
+    async def acquire(self):
+        """等待空闲名额，返回探测所属的批次，完成后交给 release()"""
+        while self.in_flight >= int(self.window):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已被唤醒又被取消，名额交给下一个等待者
+                    self._wake()
+                raise
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        if not self.adaptive:
+            return None
+        cohort = self._cohort
+        if cohort is None or cohort.size >= max(int(self.window), MIN_PROBE_WINDOW):
+            self._cohort = _Cohort(self._generation)
+            if cohort is not None:
+                self._settle(cohort)
+            cohort = self._cohort
+        cohort.size += 1
+        return cohort
+
+    def release(self, cohort=None, outcome=None):
+        """归还名额，outcome 为 PROBE_* 之一时计入窗口调整"""
+        self.in_flight -= 1
+        if cohort is not None:
+            self._observe(cohort, outcome)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.window) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _decrease(self):
+        self.window = max(self.minimum, self.window / 2)
+        self.decreases += 1
+        self._generation += 1
+
+    def _observe(self, cohort, outcome):
+        cohort.done += 1
+        current = cohort.generation == self._generation
+        if outcome == PROBE_TIMEOUT:
+            cohort.timeouts += 1
+        elif outcome == PROBE_LOCAL_ERROR:
+            if current:
+                self._decrease()
+        elif outcome == PROBE_OK and current:
+            self.window = min(self.maximum, self.window + PROBE_WINDOW_STEP / self.window)
+        if cohort is not self._cohort:
+            self._settle(cohort)
+
+    def _settle(self, cohort):
+        """批次全部完成时，按其超时率决定是否减半"""
+        if cohort.done < cohort.size or not cohort.size:
+            return
+        rate = cohort.timeouts / cohort.size
+        if cohort.generation == self._generation and self.baseline is not None:
+            if rate > self.baseline + TIMEOUT_RATE_MARGIN:
+                self._decrease()
+        if self.baseline is None or rate < self.baseline:
+            self.baseline = rate
+
+
+class ProbeEngine:
+    """基于 asyncio 的单线程探测引擎，并发探测提供 ``endpoint`` (ip, port, proto) 的对象
+
+    连接尝试期间调用 pause()，暂停时不启动新的探测，也不交出结果。
+    """
+
+    def __init__(
+        self,
+        timeout,
+        concurrency=DEFAULT_PROBE_CONCURRENCY,
+        udp_latency=60,
+        deep_tcp=False,
+        samples=1,
+        sample_interval=DEFAULT_SAMPLE_INTERVAL,
+        adaptive=True,
+        hedge_target=0,
+        logger=None,
+    ):
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.udp_latency = udp_latency
+        self.deep_tcp = deep_tcp
+        self.samples = max(1, samples)
+        self.sample_interval = sample_interval
+        self.adaptive = adaptive
+        self.last_window = None
+        self.hedge_target = max(0, hedge_target)
+        # 近期有响应的探测耗时 (ms)，用于计算第一轮的超时
+        self._latencies = collections.deque(maxlen=HEDGE_LATENCY_WINDOW)
+        self._observed = 0
+        self._first_pass_timeout = None
+        # 未暂停时置位；可从其他线程调用 pause() / resume()
+        self._running = threading.Event()
+        self._running.set()
+        # 每次暂停加一，用于识别与连接尝试重叠的探测
+        self._epoch = 0
+        self.log = logger or logging.getLogger(__name__)
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        """暂停探测，如在连接尝试开始前"""
+        self._epoch += 1
+        self._running.clear()
+
+    def resume(self):
+        """恢复被暂停的探测"""
+        self._running.set()
+
+    def wait_resumed(self):
+        """阻塞直到探测未被暂停 (供事件循环外的线程使用)"""
+        self._running.wait()
+
+    async def _wait_running(self):
+        while not self._running.is_set():
+            await asyncio.sleep(PAUSE_POLL_INTERVAL)
+
+    async def probe(self, ip, port, proto, tls_wrapped=False):
+        """探测一个端点，返回 ProbeResult"""
+        return (await self._probe(ip, port, proto, tls_wrapped))[0]
+
+    def first_pass_timeout(self):
+        """两轮探测中第一轮的超时 (秒)，不超过完整超时"""
+        if self._first_pass_timeout is None:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                timeout = HEDGE_INITIAL_TIMEOUT
+            else:
+                ordered = sorted(self._latencies)
+                p95 = ordered[int(0.95 * (len(ordered) - 1))]
+                timeout = max(HEDGE_MIN_TIMEOUT, p95 / 1000 * HEDGE_FACTOR)
+            self._first_pass_timeout = min(self.timeout, timeout)
+        return self._first_pass_timeout
+
+    def _observe_latency(self, elapsed):
+        self._latencies.append(elapsed)
+        self._observed += 1
+        # 分布稳定后每 16 个新结果重新计算一次
+        if self._observed <= HEDGE_MIN_SAMPLES or self._observed % 16 == 0:
+            self._first_pass_timeout = None
+
+    async def _probe(self, ip, port, proto, tls_wrapped, timeout=None):
+        """探测一个端点，返回 (ProbeResult, PROBE_*)"""
+        timeout = self.timeout if timeout is None else timeout
+        if not ip or not port:
+            return ProbeResult(False), None
+        if proto == "udp" and tls_wrapped:
+            # 没有密钥无法构造被接受的包，按设定的延迟处理
+            return ProbeResult(True, float(self.udp_latency)), None
+        try:
+            if proto == "udp":
+                handshake = await self._probe_udp(ip, port, timeout)
+                return ProbeResult(True, handshake, handshake), PROBE_OK
+            deep = self.deep_tcp and not tls_wrapped
+            return await self._probe_tcp(ip, port, deep, timeout), PROBE_OK
+        except asyncio.TimeoutError:
+            return ProbeResult(False), PROBE_TIMEOUT
+        except (OSError, ValueError) as e:
+            self.log.debug(f"Probe of {ip}:{port} failed: {e}")
+            if isinstance(e, OSError) and e.errno in LOCAL_ERRNOS:
+                return ProbeResult(False), PROBE_LOCAL_ERROR
+            return ProbeResult(False), PROBE_FAILED
+
+    async def _probe_tcp(self, ip, port, deep, timeout=None):
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        sock = socket.socket()
+        sock.setblocking(False)
+        try:
+            start_time = time.monotonic()
+            deadline = start_time + timeout
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, int(port))), timeout)
+            connected = time.monotonic()
+            if not deep:
+                return ProbeResult(True, (connected - start_time) * 1000)
+
+            packet, session_id = hard_reset_packet()
+            await loop.sock_sendall(sock, frame_tcp_packet(packet))
+            sent = time.monotonic()
+            header = await self._recv_exactly(sock, 2, deadline)
+            length = int.from_bytes(header, "big")
+            if not MIN_REPLY_SIZE <= length <= MAX_REPLY_SIZE:
+                # 如 TLS 警报或 HTTP 响应，不是 OpenVPN
+                raise ValueError("not an OpenVPN server")
+            reply = await self._recv_exactly(sock, length, deadline)
+            if not is_hard_reset_reply(reply, session_id):
+                raise ValueError("not an OpenVPN server")
+            return ProbeResult(
+                True,
+                (connected - start_time) * 1000,
+                (time.monotonic() - sent) * 1000,
+            )
+        finally:
+            sock.close()
+
+    async def sample(self, ip, port, proto, timeout=None):
+        """再采样一次延迟 (不再确认握手)，丢失时返回 None"""
+        try:
+            if proto == "udp":
+                return await self._probe_udp(ip, port, timeout)
+            return (await self._probe_tcp(ip, port, False, timeout)).latency
+        except (asyncio.TimeoutError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    async def _recv_exactly(sock, size, deadline):
+        loop = asyncio.get_running_loop()
+        data = b""
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            chunk = await asyncio.wait_for(
+                loop.sock_recv(sock, size - len(data)), remaining
+            )
+            if not chunk:
+                raise ConnectionResetError("connection closed by server")
+            data += chunk
+        return data
+
+    async def _probe_udp(self, ip, port, timeout=None):
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        reply = loop.create_future()
+        packet, session_id = hard_reset_packet()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _HardResetProtocol(session_id, reply),
+            remote_addr=(ip, int(port)),
+        )
+        try:
+            start_time = time.monotonic()
+            transport.sendto(packet)
+            received = await asyncio.wait_for(reply, timeout)
+            return (received - start_time) * 1000
+        finally:
+            transport.close()
+
+    def _feed(self, loop, items, queue, stop):
+        """在后台线程中遍历 items (可能边下载边产出)，交给事件循环"""
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            self.log.error(f"Failed to read servers to probe: {e}")
+        finally:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+            except RuntimeError:
+                # 事件循环已关闭 (探测被中断)
+                pass
+
+    async def results(self, items):
+        """按完成顺序产出 ``(item, ProbeResult)`` 的异步迭代器
+
+        ``items`` may be a blocking iterable (e.g. a list still being
+        downloaded); it is read in a helper thread so probing starts with
+        the first item. Closing the iterator cancels all pending probes.
+        """
+        loop = asyncio.get_running_loop()
+        incoming = asyncio.Queue()
+        finished = asyncio.Queue()
+        maximum = self.concurrency
+        fd_limit = probe_fd_limit(maximum)
+        if fd_limit is not None and fd_limit < maximum:
+            self.log.debug(f"Probe concurrency capped at {fd_limit} by the fd limit")
+            maximum = fd_limit
+        limit = AdaptiveWindow(INITIAL_PROBE_WINDOW, maximum, self.adaptive)
+        self.last_window = limit
+        stop = threading.Event()
+        tasks = set()
+        hedged = self.hedge_target > 0
+        # 第一轮超时、等待第二轮的端点，以及有响应的端点数
+        timed_out = []
+        responders = [0]
+        enough = asyncio.Event()
+
+        async def run_one(item, cohort, timeout=None, final=True):
+            ip, port, proto = item.endpoint
+            tls_wrapped = getattr(item, "tls_wrapped", False)
+            while True:
+                epoch = self._epoch
+                outcome = None
+                start_time = time.monotonic()
+                try:
+                    result, outcome = await self._probe(
+                        ip, port, proto, tls_wrapped, timeout
+                    )
+                except Exception as e:
+                    self.log.exception(f"Unexpected error during probing: {e}")
+                    result = ProbeResult(False)
+                finally:
+                    # 第一轮短截止时间到期只说明比近期响应慢，不是拥塞；
+                    # 只有完整超时才计入窗口调整
+                    congestion = outcome
+                    if epoch != self._epoch or (outcome == PROBE_TIMEOUT and not final):
+                        congestion = None
+                    limit.release(cohort, congestion)
+                if epoch == self._epoch:
+                    break
+                # 探测期间开始了连接尝试，结果可能经由隧道测得: 不交出也不缓存，恢复后重新探测
+                await self._wait_running()
+                cohort = await limit.acquire()
+            if outcome == PROBE_OK:
+                self._observe_latency((time.monotonic() - start_time) * 1000)
+            elif outcome == PROBE_TIMEOUT and not final:
+                timed_out.append(item)
+                return
+            if result.responding:
+                responders[0] += 1
+                if hedged and responders[0] >= self.hedge_target:
+                    enough.set()
+            if (
+                self.samples > 1
+                and result.responding
+                and not (proto == "udp" and tls_wrapped)
+            ):
+                # 先交出首次采样的结果，使服务器立即成为候选，其余采样完成后再交出完整结果
+                result.partial = True
+                finished.put_nowait((item, result))
+                result = ProbeResult.from_samples(
+                    result.samples, result.lost, result.handshake
+                )
+                # 丢失的采样按首次往返时间的倍数判定，不必等待完整超时
+                first_rtt = result.samples[0] / 1000
+                sample_timeout = min(
+                    self.timeout,
+                    max(MIN_SAMPLE_TIMEOUT, first_rtt * SAMPLE_TIMEOUT_FACTOR),
+                )
+                # 等待间隔时不占用并发名额；已知有响应的端点丢失采样也按超时计入
+                for _ in range(self.samples - 1):
+                    await asyncio.sleep(self.sample_interval)
+                    await self._wait_running()
+                    cohort = await limit.acquire()
+                    epoch = self._epoch
+                    latency = None
+                    try:
+                        latency = await self.sample(ip, port, proto, sample_timeout)
+                    finally:
+                        outcome = PROBE_TIMEOUT if latency is None else PROBE_OK
+                        limit.release(cohort, outcome if epoch == self._epoch else None)
+                    if epoch == self._epoch:
+                        # 与连接尝试重叠的采样直接丢弃
+                        result.add_sample(latency)
+            finished.put_nowait((item, result))
+
+        def launch(item, cohort, timeout=None, final=True):
+            task = loop.create_task(run_one(item, cohort, timeout, final))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            return task
+
+        async def second_pass():
+            """以完整超时重新探测第一轮超时的端点，直到有响应的端点达到目标数量"""
+            pending = collections.deque(timed_out)
+            if responders[0] < self.hedge_target:
+                self.log.debug(
+                    f"Hedged probing: {responders[0]} responders, re-probing up to "
+                    f"{len(pending)} timed out servers with {self.timeout}s"
+                )
+                second = {}
+                while pending and not enough.is_set():
+                    await self._wait_running()
+                    cohort = await limit.acquire()
+                    if enough.is_set():
+                        limit.release(cohort)
+                        break
+                    item = pending.popleft()
+                    second[launch(item, cohort)] = item
+                watcher = loop.create_task(enough.wait())
+                running = set(second)
+                while running and not enough.is_set():
+                    _, running = await asyncio.wait(
+                        running | {watcher}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    running.discard(watcher)
+                watcher.cancel()
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(watcher, *second, return_exceptions=True)
+                # 目标已达到时被取消的探测与未启动的一样没有结论
+                pending.extend(
+                    item for task, item in second.items() if task.cancelled()
+                )
+            for item in pending:
+                finished.put_nowait((item, ProbeResult(False, conclusive=False)))
+
+        async def dispatch():
+            while True:
+                item = await incoming.get()
+                if item is _DONE:
+                    break
+                await self._wait_running()
+                cohort = await limit.acquire()
+                if hedged:
+                    launch(item, cohort, self.first_pass_timeout(), final=False)
+                else:
+                    launch(item, cohort)
+            if tasks:
+                await asyncio.wait(set(tasks))
+            if timed_out:
+                await second_pass()
+            finished.put_nowait(_DONE)
+
+        feeder = threading.Thread(
+            target=self._feed, args=(loop, items, incoming, stop), daemon=True
+        )
+        feeder.start()
+        dispatcher = loop.create_task(dispatch())
+        try:
+            while True:
+                result = await finished.get()
+                if result is _DONE:
+                    break
+                # 连接尝试期间不把结果交给候选队列
+                await self._wait_running()
+                yield result
+        finally:
+            stop.set()
+            dispatcher.cancel()
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(dispatcher, *tasks, return_exceptions=True)
+
+    def run(self, items):
+        """同步接口: 在当前线程运行事件循环，按完成顺序产出探测结果
+
+        Ctrl+C (or closing the generator) cancels the in-flight probes at once.
+        """
+        loop = asyncio.new_event_loop()
+        agen = self.results(items)
+        step = None
+        try:
+            while True:
+                step = loop.create_task(self._next(agen))
+                try:
+                    yield loop.run_until_complete(step)
+                except StopAsyncIteration:
+                    break
+        finally:
+            try:
+                if step is not None and not step.done():
+                    # 中断于等待结果时: 取消会传入 results()，由其清理未完成的探测
+                    step.cancel()
+                    loop.run_until_complete(
+                        asyncio.gather(step, return_exceptions=True)
+                    )
+                else:
+                    loop.run_until_complete(agen.aclose())
+            finally:
+                loop.close()
+
+    @staticmethod
+    async def _next(agen):
+        return await agen.__anext__()
@@ -0,0 +1,90 @@
+# 预排序特征的默认权重: 正权重表示越大越好，负权重表示越小越好
+DEFAULT_RANK_WEIGHTS = {
+    "score": 1.0,  # VPNGate 综合评分
+    "speed": 1.0,  # 列表中的带宽
+    "ping": -1.0,  # 列表中的 ping (0 表示未知，按最差处理)
+    "uptime": 0.5,  # 服务器连续运行时长
+    "sessions": -0.25,  # 当前会话数，越多负载越高
+    "listed": 0.5,  # 历史记录中持续出现的时长
+    "stale": -1.0,  # 距最近一次出现在列表中的时长
+}
+
+
+def parse_rank_weights(spec):
+    """解析 "score=1,ping=-0.5" 形式的权重，未给出的特征使用默认权重
+
+    Raises:
+        ValueError: on an unknown feature or a weight that is not a number.
+    """
+    weights = dict(DEFAULT_RANK_WEIGHTS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, value = item.partition("=")
+        name = name.strip().lower()
+        if not sep or name not in weights:
+            raise ValueError(
+                f"unknown rank feature: {name!r} "
+                f"(expected one of {', '.join(DEFAULT_RANK_WEIGHTS)})"
+            )
+        weights[name] = float(value)
+    return weights
+
+
+def _percentiles(values):
+    """将一列数值映射到 [0, 1] 的等级，所有值相同时返回 None"""
+    levels = sorted(set(values))
+    if len(levels) < 2:
+        return None
+    scale = len(levels) - 1
+    position = {value: i / scale for i, value in enumerate(levels)}
+    return [position[value] for value in values]
+
+
+class RankModel:
+    """服务器预排序模型: 列表指标和历史记录的加权和
+
+    每个特征先在候选服务器之间换算为等级 (0 到 1)，不同量纲的指标因此可以直接加权，
+    个别极端值也不会主导结果。只用于决定探测顺序，最终连接顺序仍以探测延迟为准。
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(DEFAULT_RANK_WEIGHTS if weights is None else weights)
+
+    def _features(self, index, rows):
+        pings = [index.ping[row] for row in rows]
+        worst_ping = max(pings, default=0) + 1
+        last_seen = [index.last_seen[row] for row in rows]
+        newest = max(last_seen, default=0)
+        return {
+            "score": [index.score[row] for row in rows],
+            "speed": [index.speed[row] for row in rows],
+            "ping": [ping or worst_ping for ping in pings],
+            "uptime": [index.uptime[row] for row in rows],
+            "sessions": [index.sessions[row] for row in rows],
+            "listed": [
+                max(0, seen - index.first_seen[row]) if index.first_seen[row] else 0
+                for row, seen in zip(rows, last_seen)
+            ],
+            "stale": [newest - seen if seen else 0 for seen in last_seen],
+        }
+
+    def scores(self, index, rows):
+        """rows 中各行的得分，越高越好"""
+        rows = list(rows)
+        totals = [0.0] * len(rows)
+        for name, values in self._features(index, rows).items():
+            weight = self.weights.get(name, 0.0)
+            if not weight:
+                continue
+            levels = _percentiles(values)
+            if levels is None:
+                continue
+            for i, level in enumerate(levels):
+                totals[i] += weight * level
+        return totals
+
+    def ranked(self, index, rows):
+        """按得分从高到低排列行号，得分相同时保持原顺序"""
+        rows = list(rows)
+        scores = self.scores(index, rows)
+        order = sorted(range(len(rows)), key=lambda i: -scores[i])
+        return [rows[i] for i in order]
@@ -0,0 +1,1134 @@
+import base64
+import binascii
+import csv
+import hashlib
+import itertools
+import logging
+import marshal
+import os
+import socket
+import sqlite3
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+
+try:
+    from .module_config import CONFIG_POOL, CompactConfig
+except ImportError:
+    # 作为脚本运行时的绝对导入
+    from module_config import CONFIG_POOL, CompactConfig
+
+# 历史记录在原始列表字段之外追加的字段
+HISTORY_FIELDS = ["FirstSeen", "LastSeen"]
+# 解析服务器地址时首次解码的 Base64 前缀长度
+ENDPOINT_SCAN_PREFIX = 2048
+
+# ServerIndex 的协议编码和来源标记
+PROTO_CODES = {"tcp": 0, "udp": 1}
+SOURCE_MAIN = 1
+SOURCE_QUALIFIED = 2
+# 只出现在历史记录中、不在最近一次列表中的服务器 (同时带有 SOURCE_MAIN)
+SOURCE_HISTORY = 4
+UNKNOWN_COUNTRY = "??"
+# 列表中用于排序的数值字段 (历史记录字段换算为时间戳)，顺序与 ServerIndex.metrics_at() 一致
+METRIC_FIELDS = ["Score", "Ping", "Speed", "NumVpnSessions", "Uptime"] + HISTORY_FIELDS
+
+# 探测缓存中无响应结果的退避: 首次 1 分钟，每次连续失败翻倍，最长 1 小时
+PROBE_BACKOFF_BASE = 60  # second
+PROBE_BACKOFF_MAX = 3600  # second
+
+# 连接历史: 记录的保留时长、权重半衰期，以及视为完全成功的会话时长
+ATTEMPT_MAX_AGE = 30 * 24 * 3600  # second
+ATTEMPT_HALF_LIFE = 7 * 24 * 3600  # second
+ATTEMPT_GOOD_SESSION = 300  # second
+# 先验权重: 尝试次数少时得分向 0 收缩，单次结果不会决定排序
+ATTEMPT_PRIOR = 1.0
+
+# 解析结果快照的文件头和格式版本
+SNAPSHOT_MAGIC = b"VGSNAP\n"
+SNAPSHOT_VERSION = 3
+
+
+def _parse_endpoint(lines, ip=None):
+    port = proto = None
+    for line in lines:
+        parts = line.split()
+        if line.startswith("remote") and len(parts) == 3:
+            ip = ip or parts[1]
+            try:
+                port = int(parts[2])
+            except ValueError:
+                continue
+        elif line.startswith("proto") and len(parts) == 2:
+            proto = parts[1] if parts[1] in ("tcp", "udp") else None
+        if port and proto:
+            break
+    return ip, port, proto
+
+
+def config_endpoint(config_b64, ip=None):
+    """从 Base64 编码的 OpenVPN 配置中解析 (ip, port, proto)，无法解析时返回 None
+
+    remote 和 proto 位于配置开头，证书之前，因此只解码足够的前缀，找不到时再逐步扩大。
+    """
+    length = len(config_b64)
+    end = 0
+    port = proto = None
+    while end < length:
+        end = min(length, max(end * 2, ENDPOINT_SCAN_PREFIX))
+        complete = end == length
+        chunk = config_b64 if complete else config_b64[: end - end % 4]
+        try:
+            text = base64.b64decode(chunk).decode(
+                "utf-8", errors="strict" if complete else "ignore"
+            )
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            if complete:
+                return None
+            # 含换行等填充字符时前缀未对齐，继续扩大
+            continue
+        lines = text.splitlines()
+        if not complete:
+            # 最后一行可能被截断
+            lines = lines[:-1]
+        found_ip, port, proto = _parse_endpoint(lines, ip)
+        if port and proto:
+            ip = found_ip
+            break
+    if not ip or not port or not proto:
+        return None
+    return ip, port, proto
+
+
+class ServerRecord:
+    """服务器列表中的一行的紧凑表示
+
+    只保存排序和过滤所需的字段；OpenVPN 配置以 CompactConfig 保存，
+    证书等共享片段在 CONFIG_POOL 中只存一份。
+    只有真正尝试连接的服务器才会构建完整的 VPNClient。
+    """
+
+    __slots__ = (
+        "ip",
+        "port",
+        "proto",
+        "country",
+        "country_code",
+        "score",
+        "config",
+    )
+
+    def __init__(self, ip, port, proto, country, country_code, score, config):
+        self.ip = ip
+        self.port = port
+        self.proto = proto
+        self.country = country
+        self.country_code = country_code
+        self.score = score
+        self.config = config
+
+    @classmethod
+    def from_row(cls, row):
+        """从列表 CSV 的一行构建记录
+
+        The config is decoded and split here, not on demand: the interned
+        CompactConfig is smaller than the Base64 text it replaces, and its
+        per-server lines give the endpoint without a second decode.
+
+        Raises:
+            ValueError: if the row has no usable OpenVPN config.
+        """
+        conf = row.get("OpenVPN_ConfigData_Base64") or ""
+        if not conf:
+            raise ValueError("Missing OpenVPN config data.")
+        try:
+            text = base64.b64decode(conf).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+            raise ValueError(f"Invalid Base64 config: {e}") from e
+        config = CONFIG_POOL.compact(text)
+        # remote / proto 都在 CompactConfig 的服务器专属行中
+        ip, port, proto = _parse_endpoint(config.lines, row.get("IP") or None)
+        if not ip or not port or not proto:
+            raise ValueError("Could not determine IP, Port, or Protocol from config.")
+        try:
+            score = int(row.get("Score") or 0)
+        except ValueError:
+            score = 0
+        return cls(
+            ip,
+            port,
+            proto,
+            CONFIG_POOL.intern(row.get("CountryLong") or "Unknown"),
+            CONFIG_POOL.intern(row.get("CountryShort") or "??"),
+            score,
+            config,
+        )
+
+    @property
+    def tls_wrapped(self):
+        return self.config.tls_wrapped
+
+    @property
+    def endpoint(self):
+        return self.ip, self.port, self.proto
+
+    def as_row(self):
+        """还原为 VPNClient 可以接受的列表行 (配置通过 config 单独传递)"""
+        return {
+            "IP": self.ip,
+            "CountryLong": self.country,
+            "CountryShort": self.country_code,
+            "Score": str(self.score),
+            "#HostName": f"{self.ip}:{self.port}",
+        }
+
+    def __str__(self):
+        return (
+            f"ip={self.ip:<15}, country={self.country_code}, "
+            f"proto={self.proto}, port={self.port}"
+        )
+
+
+def ip_to_int(ip):
+    """IPv4 地址转为整数，无法转换时返回 0"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big")
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
+def _int_field(row, name):
+    try:
+        return int(float(row.get(name) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _time_field(row, name):
+    """ISO 格式的时间字段转为时间戳，缺失或无法解析时返回 0"""
+    try:
+        return int(datetime.fromisoformat(row.get(name)).timestamp())
+    except (TypeError, ValueError, OverflowError, OSError):
+        return 0
+
+
+def _row_metrics(row):
+    return tuple(
+        _time_field(row, name) if name in HISTORY_FIELDS else _int_field(row, name)
+        for name in METRIC_FIELDS
+    )
+
+
+class ServerIndex:
+    """列式存储的服务器索引，按 (IP, 端口, 协议) 去重
+
+    每个字段保存在一个紧凑数组中，过滤使用字节掩码 (bytes.translate 和整数按位与在 C 中完成)，
+    排序使用以列为键的 sorted，按端点查找为 O(1)。掩码中 1 表示选中。
+
+    Not thread-safe: callers sharing an index between threads must lock around it.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._rows = {}
+        # 国家代码编号，0 保留给未知国家；编号存在 bytearray 中，超出 255 个时归入未知
+        self.countries = [UNKNOWN_COUNTRY]
+        self._country_ids = {UNKNOWN_COUNTRY: 0}
+
+        self.ip = array("I")
+        self.port = array("H")
+        self.proto = bytearray()
+        self.country = bytearray()
+        self.source = bytearray()
+        self.score = array("q")
+        self.ping = array("i")
+        self.speed = array("q")
+        self.sessions = array("i")
+        self.uptime = array("q")
+        # 在历史记录中首次和最近出现的时间戳，不在历史记录中时为 0
+        self.first_seen = array("q")
+        self.last_seen = array("q")
+        # 探测延迟 (ms)，未探测或无响应为 inf
+        self.latency = array("d")
+        # OpenVPN 握手往返时间 (ms)，未检查时为 inf
+        self.handshake = array("d")
+        # 多次采样的统计: 最小值、中位数、p90、抖动 (ms) 和丢包率
+        self.rtt_min = array("d")
+        self.rtt_median = array("d")
+        self.rtt_p90 = array("d")
+        self.jitter = array("d")
+        self.loss = array("d")
+        self.alive = bytearray()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _country_id(self, code):
+        country_id = self._country_ids.get(code)
+        if country_id is None:
+            if len(self.countries) > 255:
+                return 0
+            country_id = len(self.countries)
+            self.countries.append(code)
+            self._country_ids[code] = country_id
+        return country_id
+
+    def add(self, record, row=None, source=SOURCE_MAIN, metrics=None):
+        """加入一条记录并返回索引中的规范记录
+
+        List metrics are taken from the CSV ``row`` or, e.g. when loading a
+        snapshot, from a ``metrics`` tuple as returned by ``metrics_at()``.
+        An endpoint that is already indexed keeps its first record; only its
+        metrics and source flags are updated.
+        """
+        if row:
+            metrics = _row_metrics(row)
+        index = self._rows.get(record.endpoint)
+        if index is not None:
+            self.source[index] |= source
+            if metrics:
+                if not metrics[-1]:
+                    # 不含历史字段的列表行不覆盖已有的历史时间
+                    metrics = metrics[:-2] + (
+                        self.first_seen[index],
+                        self.last_seen[index],
+                    )
+                self._set_metrics(index, metrics)
+            return self.records[index]
+
+        self._rows[record.endpoint] = len(self.records)
+        self.records.append(record)
+        self.ip.append(ip_to_int(record.ip))
+        self.port.append(record.port)
+        self.proto.append(PROTO_CODES.get(record.proto, 0))
+        self.country.append(self._country_id(record.country_code))
+        self.source.append(source)
+        self.score.append(record.score)
+        self.ping.append(0)
+        self.speed.append(0)
+        self.sessions.append(0)
+        self.uptime.append(0)
+        self.first_seen.append(0)
+        self.last_seen.append(0)
+        self.latency.append(float("inf"))
+        self.handshake.append(float("inf"))
+        for column in (self.rtt_min, self.rtt_median, self.rtt_p90):
+            column.append(float("inf"))
+        self.jitter.append(0.0)
+        self.loss.append(0.0)
+        self.alive.append(0)
+        if metrics:
+            self._set_metrics(len(self.records) - 1, metrics)
+        return record
+
+    def _set_metrics(self, index, metrics):
+        (
+            self.score[index],
+            self.ping[index],
+            self.speed[index],
+            self.sessions[index],
+            self.uptime[index],
+            self.first_seen[index],
+            self.last_seen[index],
+        ) = metrics
+
+    def metrics_at(self, index):
+        """(Score, Ping, Speed, NumVpnSessions, Uptime, FirstSeen, LastSeen) of a row"""
+        return (
+            self.score[index],
+            self.ping[index],
+            self.speed[index],
+            self.sessions[index],
+            self.uptime[index],
+            self.first_seen[index],
+            self.last_seen[index],
+        )
+
+    def row_of(self, endpoint):
+        """端点所在的行号，未收录时返回 None"""
+        return self._rows.get(endpoint)
+
+    def get(self, endpoint):
+        index = self._rows.get(endpoint)
+        return None if index is None else self.records[index]
+
+    def newest_seen(self):
+        """最近一次合并进历史记录的列表时间，即最大的 LastSeen"""
+        return max(self.last_seen, default=0)
+
+    def tag_history_only(self, rows, reference):
+        """LastSeen 早于 reference 的行标记为 SOURCE_HISTORY，其余行清除该标记"""
+        for row in rows:
+            if 0 < self.last_seen[row] < reference:
+                self.source[row] |= SOURCE_HISTORY
+            else:
+                self.source[row] &= ~SOURCE_HISTORY
+
+    def set_latency(self, endpoint, latency, handshake=None):
+        """记录探测结果，latency 为 inf 表示无响应"""
+        index = self._rows.get(endpoint)
+        if index is None:
+            return
+        self.latency[index] = latency
+        self.handshake[index] = float("inf") if handshake is None else handshake
+        self.alive[index] = latency != float("inf")
+
+    def set_stats(self, endpoint, rtt_min, median, p90, jitter, loss):
+        """记录多次采样的延迟统计"""
+        index = self._rows.get(endpoint)
+        if index is None:
+            return
+        self.rtt_min[index] = rtt_min
+        self.rtt_median[index] = median
+        self.rtt_p90[index] = p90
+        self.jitter[index] = jitter
+        self.loss[index] = loss
+
+    @staticmethod
+    def _translate(column, predicate):
+        table = bytes(1 if predicate(value) else 0 for value in range(256))
+        return bytes(column).translate(table)
+
+    def country_mask(self, codes, exclude=False):
+        """国家在 codes 中 (exclude 为 True 时不在其中) 的行"""
+        ids = {self._country_ids[code] for code in codes if code in self._country_ids}
+        return self._translate(self.country, lambda value: (value in ids) != exclude)
+
+    def source_mask(self, source, exclude=0):
+        """带有 source 标记且不带 exclude 标记的行"""
+        return self._translate(
+            self.source, lambda value: bool(value & source) and not value & exclude
+        )
+
+    def alive_mask(self):
+        return bytes(self.alive)
+
+    def combine(self, *masks):
+        """按位与组合多个掩码"""
+        size = len(self.records)
+        result = (1 << (8 * size)) - 1
+        for mask in masks:
+            result &= int.from_bytes(mask, "little")
+        return result.to_bytes(size, "little")
+
+    def select(self, mask):
+        """掩码选中的行号，保持收录顺序"""
+        return list(itertools.compress(range(len(mask)), mask))
+
+    def ranked(self, rows, column=None):
+        """按某一列升序排列行号，默认按探测延迟"""
+        column = self.latency if column is None else column
+        return sorted(rows, key=column.__getitem__)
+
+    def records_at(self, rows):
+        records = self.records
+        return [records[index] for index in rows]
+
+
+def file_digest(path):
+    """文件内容的 SHA-256"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ListSnapshot:
+    """服务器列表解析结果的二进制快照，避免每次启动重新解析 CSV
+
+    快照按列保存 ServerIndex 中的记录 (marshal 格式)，配置按 CompactConfig 保存:
+    共享片段和模板各存一份，每个服务器只保存模板编号和自己的指令行。
+    并以源 CSV 的大小、修改时间和 SHA-256 为键。大小和修改时间一致时直接使用；
+    只有修改时间变化 (如 304 时刷新缓存) 时再比较哈希，内容未变则继续使用。
+    """
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.log = logger or logging.getLogger(__name__)
+
+    def _read(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if not data.startswith(SNAPSHOT_MAGIC):
+                return None
+            snapshot = marshal.loads(data[len(SNAPSHOT_MAGIC) :])
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def _write(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(marshal.dumps(snapshot))
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError) as e:
+            self.log.debug(f"Failed to save list snapshot: {e}")
+
+    def load(self, source_path):
+        """返回快照中的 [(ServerRecord, metrics), ...]，快照缺失或已过期时返回 None"""
+        snapshot = self._read()
+        if not snapshot or snapshot["source"] != os.path.abspath(source_path):
+            return None
+        try:
+            stat = os.stat(source_path)
+            if stat.st_size != snapshot["size"]:
+                return None
+            if stat.st_mtime_ns != snapshot["mtime_ns"]:
+                if file_digest(source_path) != snapshot["sha256"]:
+                    return None
+                # 内容未变，只更新修改时间，下次启动无需再计算哈希
+                snapshot["mtime_ns"] = stat.st_mtime_ns
+                self._write(snapshot)
+            return self._decode(snapshot)
+        except (OSError, KeyError, ValueError, TypeError) as e:
+            self.log.debug(f"Ignoring list snapshot: {e}")
+            return None
+
+    def save(self, source_path, index, rows):
+        """保存 index 中 rows 行作为 source_path 的解析结果"""
+        try:
+            stat = os.stat(source_path)
+            digest = file_digest(source_path)
+        except OSError as e:
+            self.log.debug(f"Failed to save list snapshot: {e}")
+            return
+        records = index.records_at(rows)
+        segment_ids = {}
+        template_ids = {}
+        templates = []
+        record_templates = array("I")
+        for record in records:
+            segments = record.config.segments
+            template_id = template_ids.get(segments)
+            if template_id is None:
+                template_id = template_ids[segments] = len(templates)
+                templates.append(
+                    array(
+                        "i",
+                        (
+                            -1
+                            if segment is None
+                            else segment_ids.setdefault(segment, len(segment_ids))
+                            for segment in segments
+                        ),
+                    ).tobytes()
+                )
+            record_templates.append(template_id)
+        metrics = [array("q") for _ in METRIC_FIELDS]
+        for row in rows:
+            for column, value in zip(metrics, index.metrics_at(row)):
+                column.append(value)
+
+        self._write(
+            {
+                "version": SNAPSHOT_VERSION,
+                "source": os.path.abspath(source_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest,
+                "ip": "\0".join(record.ip for record in records),
+                "port": array("H", (record.port for record in records)).tobytes(),
+                "proto": "\0".join(record.proto for record in records),
+                "country": "\0".join(record.country for record in records),
+                "country_code": "\0".join(record.country_code for record in records),
+                "segments": list(segment_ids),
+                "templates": templates,
+                "config_template": record_templates.tobytes(),
+                "config_lines": "\0".join(
+                    "\n".join(record.config.lines) for record in records
+                ),
+                "metrics": [column.tobytes() for column in metrics],
+            }
+        )
+
+    @staticmethod
+    def _decode(snapshot):
+        ports = array("H")
+        ports.frombytes(snapshot["port"])
+        count = len(ports)
+        if not count:
+            return []
+        record_templates = array("I")
+        record_templates.frombytes(snapshot["config_template"])
+        metrics = []
+        for data in snapshot["metrics"]:
+            column = array("q")
+            column.frombytes(data)
+            metrics.append(column)
+        columns = [
+            snapshot[name].split("\0")
+            for name in ("ip", "proto", "country", "country_code", "config_lines")
+        ]
+        if any(len(column) != count for column in columns + metrics) or len(
+            record_templates
+        ) != count:
+            raise ValueError("inconsistent snapshot columns")
+
+        # 片段和模板重新驻留到 CONFIG_POOL，与之后解析的配置共享
+        segments = [CONFIG_POOL.intern(segment) for segment in snapshot["segments"]]
+        templates = []
+        for data in snapshot["templates"]:
+            ids = array("i")
+            ids.frombytes(data)
+            templates.append(
+                CONFIG_POOL.template(None if i < 0 else segments[i] for i in ids)
+            )
+
+        ips, protos, countries, country_codes, config_lines = columns
+        result = []
+        for ip, port, proto, country, country_code, template, lines, values in zip(
+            ips,
+            ports,
+            protos,
+            countries,
+            country_codes,
+            record_templates,
+            config_lines,
+            zip(*metrics),
+        ):
+            config = CompactConfig(
+                templates[template], tuple(lines.split("\n")) if lines else ()
+            )
+            record = ServerRecord(
+                ip,
+                port,
+                proto,
+                CONFIG_POOL.intern(country),
+                CONFIG_POOL.intern(country_code),
+                values[0],
+                config,
+            )
+            result.append((record, values))
+        return result
+
+
+class QualifiedStore:
+    """优质服务器库 (SQLite)，按 (IP, 端口, 协议) 去重
+
+    每个服务器只保存一份 Base64 配置，并记录合格次数、首次和最近合格时间以及累计连接时长。
+    配置直接以 Base64 字节保存，加载时无需解码再编码。
+    首次打开时会导入旧的 qualified_vpns.csv (去重后重命名为 .migrated)。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS qualified (
+            ip TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            proto TEXT NOT NULL,
+            country TEXT,
+            country_code TEXT,
+            config_b64 BLOB NOT NULL,
+            qualified_count INTEGER NOT NULL DEFAULT 0,
+            first_qualified TEXT,
+            last_qualified TEXT,
+            uptime REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (ip, port, proto)
+        )
+    """
+
+    def __init__(self, path, legacy_csv_path=None, logger=None):
+        self.path = path
+        self.legacy_csv_path = legacy_csv_path
+        self.log = logger or logging.getLogger(__name__)
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            with conn:
+                conn.execute(self.SCHEMA)
+            self._ready = True
+            self._migrate_csv(conn)
+        return conn
+
+    def _migrate_csv(self, conn):
+        """导入旧版 qualified_vpns.csv"""
+        legacy = self.legacy_csv_path
+        if not legacy or not os.path.exists(legacy):
+            return
+        imported = 0
+        with open(legacy, "r", encoding="utf-8", newline="") as f:
+            with conn:
+                for row in csv.DictReader(f):
+                    config_b64 = (row.get("ConfigBase64") or "").encode("ascii")
+                    endpoint = config_endpoint(config_b64, row.get("IP") or None)
+                    if endpoint is None:
+                        continue
+                    self._upsert(
+                        conn,
+                        endpoint,
+                        row.get("Country"),
+                        row.get("CountryCode"),
+                        config_b64,
+                        None,
+                    )
+                    imported += 1
+        os.replace(legacy, legacy + ".migrated")
+        self.log.debug(f"Imported {imported} rows from {legacy}")
+
+    @staticmethod
+    def _upsert(conn, endpoint, country, country_code, config_b64, stamp):
+        ip, port, proto = endpoint
+        updated = conn.execute(
+            """
+            UPDATE qualified
+            SET country = ?, country_code = ?, config_b64 = ?,
+                qualified_count = qualified_count + 1,
+                last_qualified = COALESCE(?, last_qualified)
+            WHERE ip = ? AND port = ? AND proto = ?
+            """,
+            (country, country_code, config_b64, stamp, ip, port, proto),
+        ).rowcount
+        if not updated:
+            conn.execute(
+                """
+                INSERT INTO qualified (
+                    ip, port, proto, country, country_code, config_b64,
+                    qualified_count, first_qualified, last_qualified
+                ) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+                """,
+                (ip, port, proto, country, country_code, config_b64, stamp, stamp),
+            )
+
+    def qualify(self, endpoint, country, country_code, config_b64, now=None):
+        """记录一次合格 (稳定连接达到设定时长)"""
+        if isinstance(config_b64, str):
+            config_b64 = config_b64.encode("ascii")
+        stamp = (now or datetime.now()).isoformat(timespec="seconds")
+        conn = self._connect()
+        try:
+            with conn:
+                self._upsert(conn, endpoint, country, country_code, config_b64, stamp)
+        finally:
+            conn.close()
+
+    def add_uptime(self, endpoint, seconds):
+        """累加一次连接的时长，不在库中的服务器不记录"""
+        ip, port, proto = endpoint
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE qualified SET uptime = uptime + ? "
+                    "WHERE ip = ? AND port = ? AND proto = ?",
+                    (seconds, ip, port, proto),
+                )
+        finally:
+            conn.close()
+
+    def records(self):
+        """按合格次数和最近合格时间排序的 ServerRecord 列表"""
+        if not os.path.exists(self.path) and not (
+            self.legacy_csv_path and os.path.exists(self.legacy_csv_path)
+        ):
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT ip, port, proto, country, country_code, config_b64
+                FROM qualified
+                ORDER BY qualified_count DESC, last_qualified DESC
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+        records = []
+        for ip, _, _, country, country_code, config_b64 in rows:
+            try:
+                records.append(
+                    ServerRecord.from_row(
+                        {
+                            "IP": ip,
+                            "CountryLong": country,
+                            "CountryShort": country_code,
+                            "OpenVPN_ConfigData_Base64": bytes(config_b64),
+                        }
+                    )
+                )
+            except ValueError as e:
+                self.log.debug(f"Skipping qualified server {ip}: {e}")
+        return records
+
+
+class ProbeCache:
+    """探测结果缓存 (SQLite)，按 (IP, 端口, 协议) 保存最近一次探测的延迟采样和时间
+
+    有响应的结果在 ttl 秒内有效，期间无需再次探测；无响应的结果按连续失败次数指数退避，
+    退避期间直接视为无响应，之后再重新探测。启动时一次读入内存，探测结果批量写回。
+    一轮探测 (两次 flush 之间) 没有任何服务器响应时 (如本地网络中断)，结果不可信，不记录无响应。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS probes (
+            ip TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            proto TEXT NOT NULL,
+            samples TEXT,
+            lost INTEGER NOT NULL DEFAULT 0,
+            handshake REAL,
+            probed_at REAL NOT NULL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ip, port, proto)
+        )
+    """
+
+    def __init__(self, path, ttl, logger=None):
+        self.path = path
+        self.ttl = ttl
+        self.log = logger or logging.getLogger(__name__)
+        # endpoint -> (samples, lost, handshake, probed_at, failures)
+        self._entries = {}
+        self._dirty = set()
+        # 本轮的无响应结果，待确认本轮有服务器响应后才生效
+        self._pending = {}
+        self._responders = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        with conn:
+            conn.execute(self.SCHEMA)
+        return conn
+
+    @staticmethod
+    def backoff(failures):
+        """连续失败 failures 次后的退避时长 (秒)"""
+        return min(
+            PROBE_BACKOFF_BASE * 2 ** max(0, failures - 1), PROBE_BACKOFF_MAX
+        )
+
+    def load(self, now=None):
+        """读入缓存，并删除已无用的过期记录"""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        oldest = now - max(self.ttl, PROBE_BACKOFF_MAX)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM probes WHERE probed_at < ?", (oldest,))
+            rows = conn.execute(
+                "SELECT ip, port, proto, samples, lost, handshake, probed_at, failures "
+                "FROM probes"
+            ).fetchall()
+        finally:
+            conn.close()
+        for ip, port, proto, samples, lost, handshake, probed_at, failures in rows:
+            samples = tuple(float(value) for value in (samples or "").split(",") if value)
+            self._entries[(ip, port, proto)] = (
+                samples,
+                lost,
+                handshake,
+                probed_at,
+                failures,
+            )
+
+    def fresh(self, endpoint, require_handshake=False, now=None):
+        """仍然有效的有响应结果 (samples, lost, handshake)，没有时返回 None
+
+        With ``require_handshake``, a result without a checked handshake
+        does not count (e.g. cached by a plain TCP connect probe).
+        """
+        entry = self._entries.get(endpoint)
+        if not entry or entry[4] or not entry[0]:
+            return None
+        samples, lost, handshake, probed_at, _ = entry
+        now = time.time() if now is None else now
+        if now - probed_at > self.ttl:
+            return None
+        if require_handshake and handshake is None:
+            return None
+        return samples, lost, handshake
+
+    def backing_off(self, endpoint, now=None):
+        """端点最近无响应且仍在退避期内"""
+        entry = self._entries.get(endpoint)
+        if not entry or not entry[4]:
+            return False
+        now = time.time() if now is None else now
+        return now - entry[3] < self.backoff(entry[4])
+
+    def record(self, endpoint, samples, lost=0, handshake=None, now=None):
+        """记录一次探测，samples 为空表示无响应"""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            if not samples:
+                previous = self._entries.get(endpoint)
+                failures = (previous[4] if previous else 0) + 1
+                self._pending[endpoint] = ((), lost, handshake, now, failures)
+                return
+            self._responders += 1
+            self._entries[endpoint] = (tuple(samples), lost, handshake, now, 0)
+            self._dirty.add(endpoint)
+
+    def flush(self):
+        """结束一轮探测，将新的探测结果写入数据库
+
+        The failures of a round in which no server responded are dropped.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._responders:
+                self._entries.update(pending)
+                self._dirty.update(pending)
+            elif pending:
+                self.log.debug(
+                    f"No server responded to {len(pending)} probes, "
+                    "not caching them as failures"
+                )
+            self._responders = 0
+            dirty, self._dirty = self._dirty, set()
+            entries = [(endpoint, self._entries[endpoint]) for endpoint in dirty]
+        if not entries:
+            return
+        rows = []
+        for endpoint, (samples, lost, handshake, probed_at, failures) in entries:
+            rows.append(
+                endpoint
+                + (
+                    ",".join(f"{value:.1f}" for value in samples),
+                    lost,
+                    handshake,
+                    probed_at,
+                    failures,
+                )
+            )
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO probes (ip, port, proto, samples, lost, "
+                    "handshake, probed_at, failures) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        finally:
+            conn.close()
+
+
+class AttemptHistory:
+    """连接历史 (SQLite)，按 (IP, 端口, 协议) 记录每次连接尝试的结果
+
+    每次尝试记录是否完成初始化、初始化耗时、连通性检查结果、测得的速度、会话时长和断开原因。
+    scores() 将历史汇总为 -1 到 1 之间的可靠性得分: 较新的尝试权重更高，
+    初始化后很快失败的服务器得分为负，长时间稳定的会话得分为正。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS attempts (
+            ip TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            proto TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            initialized INTEGER NOT NULL DEFAULT 0,
+            init_time REAL,
+            connectivity INTEGER,
+            speed REAL,
+            duration REAL,
+            reason TEXT
+        )
+    """
+    INDEX = (
+        "CREATE INDEX IF NOT EXISTS attempts_endpoint ON attempts (ip, port, proto)"
+    )
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.log = logger or logging.getLogger(__name__)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        with conn:
+            conn.execute(self.SCHEMA)
+            conn.execute(self.INDEX)
+        return conn
+
+    def record(self, endpoint, attempt, now=None):
+        """记录一次连接尝试，attempt 为 VPNClient.attempt 形式的字典"""
+        ip, port, proto = endpoint
+        started_at = attempt.get("started_at")
+        if started_at is None:
+            started_at = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO attempts (ip, port, proto, started_at, initialized, "
+                    "init_time, connectivity, speed, duration, reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        ip,
+                        port,
+                        proto,
+                        started_at,
+                        int(bool(attempt.get("initialized"))),
+                        attempt.get("init_time"),
+                        attempt.get("connectivity"),
+                        attempt.get("speed"),
+                        attempt.get("duration"),
+                        attempt.get("reason"),
+                    ),
+                )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def outcome(initialized, connectivity, duration, reason):
+        """单次尝试的结果值，-1 (初始化或连通性失败) 到 1 (达到 ATTEMPT_GOOD_SESSION 的会话)
+
+        用户中断或拒绝与服务器本身无关，不计负分。
+        """
+        if reason == "interrupted":
+            return 0.0
+        if not initialized or connectivity == 0:
+            return -1.0
+        if reason == "slow":
+            return -0.5
+        if reason == "rejected" or duration is None:
+            return 0.0
+        value = min(duration / ATTEMPT_GOOD_SESSION, 1.0) * 2 - 1
+        if reason == "stopped":
+            return max(value, 0.0)
+        return value
+
+    def scores(self, now=None):
+        """各端点的可靠性得分 {endpoint: score}，并删除过期的记录"""
+        if not os.path.exists(self.path):
+            return {}
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM attempts WHERE started_at < ?",
+                    (now - ATTEMPT_MAX_AGE,),
+                )
+            rows = conn.execute(
+                "SELECT ip, port, proto, started_at, initialized, connectivity, "
+                "duration, reason FROM attempts"
+            ).fetchall()
+        finally:
+            conn.close()
+        totals = {}
+        for row in rows:
+            started_at = row[3]
+            weight = 0.5 ** (max(0.0, now - started_at) / ATTEMPT_HALF_LIFE)
+            value = self.outcome(*row[4:])
+            total = totals.setdefault(row[:3], [0.0, ATTEMPT_PRIOR])
+            total[0] += weight * value
+            total[1] += weight
+        return {endpoint: value / weight for endpoint, (value, weight) in totals.items()}
+
+
+def _iter_list_rows(lines):
+    # 跳过以 '*' 开头的注释行
+    return csv.DictReader(line for line in lines if not line.startswith("*"))
+
+
+class ServerHistory:
+    """合并历次下载的服务器列表快照，按 (IP, 端口, 协议) 去重
+
+    每个服务器记录首次和最近一次出现的时间，超过 max_age_days 未再出现的服务器会被移除。
+    文件保持原始列表的 CSV 格式，可直接按原方式解析。
+    """
+
+    def __init__(self, path, max_age_days=7, logger=None):
+        self.path = path
+        self.max_age = timedelta(days=max_age_days)
+        self.log = logger or logging.getLogger(__name__)
+
+    @property
+    def enabled(self):
+        return self.max_age > timedelta(0)
+
+    def _load(self):
+        """读取历史记录，返回 (字段列表, {endpoint: row})"""
+        fieldnames = []
+        rows = {}
+        if not os.path.exists(self.path):
+            return fieldnames, rows
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            reader = _iter_list_rows(f)
+            fieldnames = list(reader.fieldnames or [])
+            for row in reader:
+                endpoint = config_endpoint(
+                    row.get("OpenVPN_ConfigData_Base64", ""), row.get("IP")
+                )
+                if endpoint:
+                    rows[endpoint] = row
+        return fieldnames, rows
+
+    def needs_merge(self, snapshot_path):
+        """快照文件比历史记录新时需要合并"""
+        if not self.enabled or not os.path.exists(snapshot_path):
+            return False
+        if not os.path.exists(self.path):
+            return True
+        return os.path.getmtime(snapshot_path) > os.path.getmtime(self.path)
+
+    def merge(self, snapshot_path, now=None):
+        """将一次列表快照合并进历史记录
+
+        Returns:
+            (added, updated, expired) counts.
+        """
+        now = now or datetime.now()
+        stamp = now.isoformat(timespec="seconds")
+        fieldnames, rows = self._load()
+        added = updated = 0
+
+        with open(snapshot_path, "r", encoding="utf-8", newline="") as f:
+            reader = _iter_list_rows(f)
+            for name in reader.fieldnames or []:
+                if name not in fieldnames:
+                    fieldnames.append(name)
+            for row in reader:
+                endpoint = config_endpoint(
+                    row.get("OpenVPN_ConfigData_Base64", ""), row.get("IP")
+                )
+                if not endpoint:
+                    continue
+                previous = rows.get(endpoint)
+                if previous:
+                    row["FirstSeen"] = previous.get("FirstSeen") or stamp
+                    updated += 1
+                else:
+                    row["FirstSeen"] = stamp
+                    added += 1
+                row["LastSeen"] = stamp
+                rows[endpoint] = row
+
+        expired = 0
+        for endpoint in list(rows):
+            try:
+                last_seen = datetime.fromisoformat(rows[endpoint].get("LastSeen"))
+            except (TypeError, ValueError):
+                last_seen = now
+            if now - last_seen > self.max_age:
+                del rows[endpoint]
+                expired += 1
+
+        for name in HISTORY_FIELDS:
+            if name not in fieldnames:
+                fieldnames.append(name)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows.values())
+        os.replace(tmp_path, self.path)
+        return added, updated, expired
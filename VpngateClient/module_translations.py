@@ -9,29 +9,42 @@ translations = {
         "up": "up",
         "down": "down",
         "privileges_check": "\033[31mThis script requires root privileges. Please run as root.\033[0m",
-        "proxy_running": "A proxy server running at port \033[90;4m%s\033[0m, use Proxy to download",
+        "proxy_running": "A proxy server is running at \033[90;4m%s\033[0m, use Proxy to download",
         "Released_at": "Released at",
         "vpn_start_running": "\033[2J\033[H\033[32m[VPNGATE-CLIENT] Version: %s\033[0m",
         "vpnlist_expired": "\033[33mVPN servers list expired,download now!\033[0m",
+        "vpnlist_history_merged": "Server history updated: %i added, %i updated, %i expired",
+        "vpnlist_snapshot_loaded": "Loaded %i servers from the parsed list snapshot of %s",
+        "vpnlist_stale_refreshing": "\033[33mVPN servers list expired, using it while refreshing in background\033[0m",
+        "vpnlist_refreshed_in_background": "VPN list refreshed in background: \033[90m%i\033[0m servers, \033[32m%i\033[0m new responding servers added",
+        "vpnlist_background_refresh_failed": "\033[31mBackground VPN list refresh failed: %s\033[0m",
         "download_from_main_url": "Downloading VPN list from \033[90;4m%s\033[0m",
         "vpnlist_download_saved_to_file": "VPN list downloaded and saved to \033[90;4m%s\033[0m",
-        "failed_to_download_from_main_url": "\033[31mMain URL is unavailable, switch to backup URL!\033[0m",
-        "proxy_check_failed": "Proxy check failed for \033[4m%s\033[0m",
-        "available_GitHub_proxy": "\033[32mFound available GitHub proxy: \033[4m%s\033[0m",
+        "vpnlist_not_modified": "VPN list not modified upstream, cache refreshed: \033[90;4m%s\033[0m",
         "fallback_to_original_url": "No available proxy found, using original URL: \033[90;4m%s\033[0m",
-        "attempt_download_from_backup_url": "Attempting to download from backup URL: \033[90;4m%s\033[0m",
-        "failed_to_download_from_backup_url": "Failed to download from backup URL too: \033[90;4m%s\033[0m",
+        "vpnlist_source_won": "Using VPN list from \033[90;4m%s\033[0m (%.2f s)",
+        "vpnlist_waiting_for_download": "Waiting for the VPN list download to finish before connecting...",
+        "failed_to_download_vpnlist": "\033[31mAll VPN list sources failed, using cached list\033[0m",
         "file_path_not_found": "File path not found: \033[90;4m%s\033[0m",
         "get_vpnlist_with_backup_proxy": "Get VPN list with backup proxy: \033[90;4m%s\033[0m",
         "loading_vpn_list": "Loading VPN list...",
         "qualified": "Qualified",
         "main_list": "Main",
+        "history_list": "History",
         "overall": "All",
         "load_vpn_servers_list": "Loading \033[90;4m%s\033[0m total \033[32m%i\033[0m servers",
         "qualified_vpn_csv": "Qualified list",
         "main_vpn_csv": "Main list",
         "found_vpn_servers": "From \033[90;4m%s\033[0m Loaded \033[32m%i\033[0m",
         "probing_vpns_concurrently": "Probing \033[90;4m%s\033[0m VPNs concurrently (workers=%s)...",
+        "probing_vpns_streaming": "Probing VPNs while the list downloads (workers=%s)...",
+        "vpnlist_early_start": "\033[32m%i\033[0m responding VPNs ready, connecting while probing goes on...",
+        "vpnlist_probe_cache_hits": "Probe cache: %i fresh results reused, %i recently unresponsive servers skipped",
+        "vpnlist_probe_concurrency": "Probe concurrency: peak \033[32m%i\033[0m in flight, final window %i (limit %i, %i backoffs)",
+        "vpnlist_streamed_top_tier": "Probed the first \033[32m%i\033[0m main list VPNs as they arrived, pre-ranked the remaining \033[90m%i\033[0m",
+        "vpnlist_pre_ranked": "Pre-ranked \033[90m%i\033[0m main list VPNs, probing the top \033[32m%i\033[0m first",
+        "vpnlist_probing_next_tier": "Probing the next \033[32m%i\033[0m pre-ranked VPNs (\033[90m%i\033[0m more deferred)...",
+        "failed_to_stream_vpnlist": "\033[31mVPN list download interrupted: %s, using cached list for the rest\033[0m",
         "default_filter": "No geographic filters applied. Excluding \033[90m%s\033[0m VPNs from China (CN), Use \033[90m-c CN\033[0m to chose China servers.",
         "filtering_servers": "Filtering out unresponsive VPN servers",
         "found_responding_vpns": "Found \033[32m%i\033[0m responding VPNs overall",
@@ -63,18 +76,13 @@ translations = {
         "termination_timeout": "Termination timed out. Killing the process.",
         "vpn_unkillable": "The VPN process can't be killed!",
         "checking_if_qualified": "Connection stable for %s minutes. Checking if qualified.",
-        "VPN Connected stable in n minutes, save VPN config in CSV file": "\033[32mVPN Connected stable in %i minutes, save VPN config in CSV file: %s\033[0m",
+        "VPN Connected stable in n minutes, save VPN config in CSV file": "\033[32mVPN Connected stable in %i minutes, saved VPN config to: %s\033[0m",
         "Qualified config file already exists. Skipping save.": "Qualified config file already exists: %s. Skipping save.",
         "(No status change for %s seconds)": "(No status change for %s seconds)",
         "delete_tmp_dir": "The temporary folder has been deleted",
         "delete_tmp_dir_failed": "Temporary folder deletion failed",
         "exiting": "\033[31mExiting...\033[0m",
         # debug输出
-        "probing_vpn": "Probing VPN endpoint",
-        "cant_probe_udp": "Can't probe UDP servers, set lateny as %s ms, to sort it first",
-        "vpn_not_responding": "VPN endpoint did not respond to connection",
-        "connection_failed": "Connection failed",
-        "vpn_listening": "VPN endpoint is listening",
         # warning
         "Speedtest failed or returned error. Monitoring connection before prompting.": "Speedtest failed or returned error. Monitoring connection before prompting.",
         # OpenVPN/环境相关
@@ -91,21 +99,33 @@ translations = {
         "h_help": "show this help message and exit",
         "h_arg_country": "A 2 char country code (e.g. CA for Canada) from which to look for VPNs. If specified multiple times, VPNs from all the countries will be selected.",
         "h_arg_eu": "Adds European countries to the list of considerable countries.",
-        "h_arg_probes": "Number of concurrent connection probes to send.",
+        "h_arg_probes": "Maximum number of concurrent connection probes (all run in one thread). The window adapts below it to timeouts and errors and is capped by the open file limit.",
+        "h_arg_hedge_pool": "Probe in two passes: first with a short timeout derived from the observed latencies (p95 x 3), then re-probe the servers that timed out with --probe-timeout only until this many servers responded. 0 = a single pass with --probe-timeout.",
+        "h_arg_fixed_probes": "Always run --probes concurrent probes instead of adapting the window.",
+        "h_arg_deep_probe": "Confirm TCP servers with an OpenVPN handshake instead of just an open port (rejects SoftEther/HTTPS-only listeners).",
+        "h_arg_probe_samples": "Latency samples per responding VPN. With more than one, VPNs are sorted by the median plus a packet loss penalty instead of a single noisy timing.",
+        "h_arg_early_start": "Start connecting once this many VPNs responded within the latency budget, while probing goes on. 0 waits for all probes.",
+        "h_arg_latency_budget": "Latency (ms) under which a responding VPN counts towards --early-start.",
+        "h_arg_probe_cache_ttl": "Minutes a responding probe result is reused instead of probing again; unresponsive servers are retried with exponential backoff. 0 disables the cache.",
+        "h_arg_probe_top": "Probe only the top N main list VPNs by pre-ranking (list metrics and history) first, the rest tier by tier when needed. 0 probes all at once.",
+        "h_arg_rank_weights": "Pre-ranking weights, e.g. 'score=1,speed=1,ping=-1,uptime=0.5,sessions=-0.25,listed=0.5,stale=-1'. Unlisted features keep their default weight.",
         "h_arg_iptables": "Setting iptables rules to block non-VPN traffic",
         "h_arg_probe_timeout": "When probing, how long to wait for connection until marking the VPN as unavailable (seconds).",
         "h_arg_url": "URL of the VPN list (csv).",
+        "h_arg_hedge_delay": "Delay between starting the next VPN list source in the download race (seconds, 0 = all at once).",
         "h_arg_us": "Adds United States to the list of possible countries. Shorthand or --country US.",
         "h_arg_verbose": "More verbose output.",
         "h_arg_vpn_timeout": "Time to wait for a VPN to be established before giving up (seconds).",
         "h_arg_vpn_timeout_poll_interval": "Time between two checks for a potential timeout (seconds).",
         "h_arg_ovpnfile": "Connects to the OpenVPN VPN whose configuration is in the provided .ovpn file.",
         "h_arg_expired_time": "Time to wait for a ServersList to be expired (hour).",
+        "h_arg_stale_max_age": "Expired ServersList younger than this is used right away while it refreshes in background (hour, 0 = always wait for download).",
         "h_arg_min_speed": "Minimum download speed (MB/s).",
+        "h_arg_history_max_age": "Keep servers from earlier VPN lists for this long after they were last seen (day, 0 = only use the latest list).",
         "h_arg_qualified_time": "After a stable connection for a period of time, save the server information to the favorite configuration for the next priority load (minutes)",
         "h_arg_sort_latency": "Enable latency sorting, use \033[90m--no-sort-latency\033[0m to disable latency sorting",
         "h_arg_no_sort_latency": "Disable latency sorting",
-        "h_arg_udp_latency": "Set default latency(ms) for UDP protocol VPNs (for sorting).",
+        "h_arg_udp_latency": "Set default latency(ms) for UDP VPNs that cannot be probed (tls-auth/tls-crypt), for sorting.",
         "h_arg_only_check_tiktok": "Only check TikTok servers, ignore other errors.",
         # 新增日志相关翻译
         "Missing OpenVPN config data.": "Missing OpenVPN config data.",
@@ -113,7 +133,6 @@ translations = {
         "Invalid Base64 config: %s": "Invalid Base64 config: %s",
         "Could not determine IP, Port, or Protocol from config.": "Could not determine IP, Port, or Protocol from config.",
         "New VPN: ip=%s, proto=%s port=%s country=%s (%s)": "New VPN: ip=%s, proto=%s port=%s country=%s (%s)",
-        "Cannot probe VPN without IP and Port.": "Cannot probe VPN without IP and Port.",
         "Failed to write config file %s: %s": "Failed to write config file %s: %s",
         "VPN process did not initialize correctly.": "VPN process did not initialize correctly.",
         "Failed to set up firewall rules. Terminating connection.": "Failed to set up firewall rules. Terminating connection.",
@@ -131,7 +150,6 @@ translations = {
         "VPN连接稳定，保存配置到文件\n %s。": "VPN connection stable, saving config to file\n %s.",
         "Failed to save qualified VPN info: %s": "Failed to save qualified VPN info: %s",
         "Unexpected error saving qualified VPN: %s": "Unexpected error saving qualified VPN: %s",
-        "Already saved as qualified during this run.": "Already saved as qualified during this run.",
         "VPN process already terminated or not started.": "VPN process already terminated or not started.",
         "Sent SIGTERM to PID %s.": "Sent SIGTERM to PID %s.",
         "Process with PID %s not found for termination (already gone?).": "Process with PID %s not found for termination (already gone?).",
@@ -157,24 +175,18 @@ translations = {
         "Including VPNs in Europe": "Including VPNs in Europe",
         "Including VPNs in USA": "Including VPNs in USA",
         "Including VPNs in %s": "Including VPNs in %s",
-        "Found %s, but no VPNs were loaded from it.": "Found %s, but no VPNs were loaded from it.",
         "Failed to read or process %s: %s": "Failed to read or process %s: %s",
-        "Error parsing row from qualified_vpns.csv: %s - %s": "Error parsing row from qualified_vpns.csv: %s - %s",
         "Failed to read or process main VPN list %s: %s": "Failed to read or process main VPN list %s: %s",
-        "system proxy error: %s": "system proxy error: %s",
+        "Error parsing row from main VPN list: %s - %s": "Error parsing row from main VPN list: %s - %s",
+        "Configs directory not found: %s": "Configs directory not found: %s",
         "code: %s": "code: %s",
         "I/O Error during monitoring: %s": "I/O Error during monitoring: %s",
         "An unexpected error occurred during vpn_monitor: %s": "An unexpected error occurred during vpn_monitor: %s",
         "Qualified VPNs after responsiveness filter: %s": "Qualified VPNs after responsiveness filter: %s",
         "Main list VPNs after responsiveness filter: %s": "Main list VPNs after responsiveness filter: %s",
         "Connection attempt declined or failed for: %s": "Connection attempt declined or failed for: %s",
-        "Attempting connections from %s list (%s VPNs)...": "Attempting connections from %s list (%s VPNs)...",
-        "No VPNs to try in %s list.": "No VPNs to try in %s list.",
         "Connection established and confirmed with: %s": "Connection established and confirmed with: %s",
         "Connection process interrupted by user.": "Connection process interrupted by user.",
-        "Skipping qualified VPN list as it is empty.": "Skipping qualified VPN list as it is empty.",
-        "Skipping main VPN list as it is empty.": "Skipping main VPN list as it is empty.",
-        "Connection already established from the qualified list. Skipping main list.": "Connection already established from the qualified list. Skipping main list.",
         "Failed to establish a connection with any VPN from any list.": "Failed to establish a connection with any VPN from any list.",
         " during VPN wait.": " during VPN wait.",
     },
@@ -185,29 +197,42 @@ translations = {
         "up": "上行",
         "down": "下行",
         "privileges_check": "\033[31m需要管理员权限,请使用 sudo 以 root 运行\033[0m",
-        "proxy_running": "系统代理在端口 \033[90;4m%s\033[0m 开放, 使用系统代理下载",
+        "proxy_running": "系统代理 \033[90;4m%s\033[0m 可用, 使用系统代理下载",
         "Released_at": "发布于",
         "vpn_start_running": "\033[2J\033[H\033[32m[VPNGATE 客户端] 版本: %s\033[0m",
         "vpnlist_expired": "\033[33mVPN 服务器列表已过期，重新下载!\033[0m",
+        "vpnlist_history_merged": "服务器历史记录已更新: 新增 %i, 更新 %i, 过期 %i",
+        "vpnlist_snapshot_loaded": "从解析快照加载 %i 个服务器 (%s)",
+        "vpnlist_stale_refreshing": "\033[33mVPN 服务器列表已过期，先使用旧列表并在后台更新\033[0m",
+        "vpnlist_refreshed_in_background": "后台更新 VPN 列表完成: \033[90m%i\033[0m 个节点, 新增 \033[32m%i\033[0m 个可用节点",
+        "vpnlist_background_refresh_failed": "\033[31m后台更新 VPN 列表失败: %s\033[0m",
         "download_from_main_url": "从 \033[90;4m%s\033[0m 下载 VPN 列表",
         "vpnlist_download_saved_to_file": "VPN 列表已下载并保存到 \033[90;4m%s\033[0m",
-        "failed_to_download_from_main_url": "\033[31m主下载网址不可用，切换备用网址！\033[0m",
-        "proxy_check_failed": "GitHub 代理地址 \033[4m%s\033[0m 暂不可用！",
-        "available_GitHub_proxy": "\033[32m发现可用GitHub 代理: \033[4m%s\033[0m",
+        "vpnlist_not_modified": "VPN 列表未更新，已刷新本地缓存: \033[90;4m%s\033[0m",
         "fallback_to_original_url": "没有可用GitHub代理，使用原始网址: \033[90;4m%s\033[0m",
-        "attempt_download_from_backup_url": "尝试从备用网址下载: \033[90;4m%s\033[0m",
-        "failed_to_download_from_backup_url": "从备用地址 \033[90;4m%s\033[0m 也下载失败了！",
+        "vpnlist_source_won": "使用 \033[90;4m%s\033[0m 的 VPN 列表 (%.2f 秒)",
+        "vpnlist_waiting_for_download": "等待 VPN 列表下载完成后再连接...",
+        "failed_to_download_vpnlist": "\033[31m所有 VPN 列表来源均下载失败，使用本地缓存\033[0m",
         "file_path_not_found": "文件路径不存在: \033[90;4m%s\033[0m",
         "get_vpnlist_with_backup_proxy": "使用备用代理获取 VPN 服务器列表: \033[90;4m%s\033[0m",
         "loading_vpn_list": "加载VPN服务器列表...",
         "qualified": "收藏",
         "main_list": "主要",
+        "history_list": "历史",
         "overall": "全部",
         "load_vpn_servers_list": "加载 \033[90;4m%s\033[0m 总计 \033[32m%2i\033[0m 个节点",
         "qualified_vpn_csv": "收藏",
         "main_vpn_csv": "主要",
         "found_vpn_servers": "加载 \033[90;4m%s\033[0m 数量: \033[32m%i\033[0m",
         "probing_vpns_concurrently": "并发检测 \033[90;4m%s\033[0m 个节点...(并发数=\033[90m%s\033[0m)",
+        "probing_vpns_streaming": "边下载边检测节点...(并发数=\033[90m%s\033[0m)",
+        "vpnlist_early_start": "已有 \033[32m%i\033[0m 个可用节点，边检测边开始连接...",
+        "vpnlist_probe_cache_hits": "探测缓存: 复用 %i 个有效结果，跳过 %i 个近期无响应的节点",
+        "vpnlist_probe_concurrency": "探测并发: 峰值 \033[32m%i\033[0m，最终窗口 %i (上限 %i，减半 %i 次)",
+        "vpnlist_streamed_top_tier": "已边下载边检测前 \033[32m%i\033[0m 个主列表节点，其余 \033[90m%i\033[0m 个已预排序",
+        "vpnlist_pre_ranked": "主列表 \033[90m%i\033[0m 个节点已预排序，先检测排名前 \033[32m%i\033[0m 个",
+        "vpnlist_probing_next_tier": "检测下一批 \033[32m%i\033[0m 个预排序节点 (还剩 \033[90m%i\033[0m 个)...",
+        "failed_to_stream_vpnlist": "\033[31mVPN 列表下载中断: %s, 其余节点使用本地缓存\033[0m",
         "default_filter": "默认排除 \033[90m%s\033[0m 个 CN 节点, 使用 \033[90m-c CN\033[0m 选择中国节点",
         "filtering_servers": "过滤无响应服务器",
         "found_responding_vpns": "发现 \033[32m%i\033[0m 个可用 VPN 服务器",
@@ -245,11 +270,6 @@ translations = {
         "delete_tmp_dir_failed": "临时文件夹删除失败",
         "exiting": "\033[31m退出程序...\033[0m",
         # debug
-        "probing_vpn": "正在探测 VPN 端点",
-        "cant_probe_udp": "无法探测 UDP 服务器, 指定延迟为 %s ms, 以获取靠前排序",
-        "vpn_not_responding": "VPN 端点未响应连接",
-        "connection_failed": "连接失败",
-        "vpn_listening": "VPN 正在监听，延迟 %s",
         # warning
         "Speedtest failed or returned error. Monitoring connection before prompting.": "速度检测出错,继续检查状态文件二次确认",
         # OpenVPN/环境相关
@@ -267,21 +287,33 @@ translations = {
         "h_help": "显示此帮助信息并退出",
         "h_arg_country": "指定一个两位字母的国家代码（例如 CA 代表加拿大），用于选择 VPN。可多次指定多个国家的 VPN。",
         "h_arg_eu": "将欧洲国家添加到可考虑的国家列表中。",
-        "h_arg_probes": "发送的并发连接探测数量。",
+        "h_arg_probes": "同时进行的连接探测数量上限 (全部在一个线程中进行)。实际并发窗口根据超时和错误自动调整，并受打开文件数限制。",
+        "h_arg_hedge_pool": "分两轮探测: 第一轮使用由已测延迟得出的短超时 (p95 x 3)，之后仅在有响应的节点少于此数量时，以 --probe-timeout 重新探测超时的节点，达到数量即停止。0 = 只以 --probe-timeout 探测一轮。",
+        "h_arg_fixed_probes": "始终以 --probes 的数量并发探测，不自动调整并发窗口。",
+        "h_arg_deep_probe": "通过 OpenVPN 握手确认 TCP 服务器，而不只检查端口是否开放 (排除 SoftEther/HTTPS 等非 OpenVPN 服务)。",
+        "h_arg_probe_samples": "每个有响应的 VPN 的延迟采样次数。大于 1 时按中位数加丢包惩罚排序，而不是单次不稳定的测量。",
+        "h_arg_early_start": "有这么多节点在延迟预算内响应后即开始连接，其余继续检测。0 表示等待全部检测完成。",
+        "h_arg_latency_budget": "计入 --early-start 的节点延迟上限（毫秒）。",
+        "h_arg_probe_cache_ttl": "有响应的探测结果在多少分钟内直接复用；无响应的节点按指数退避后再探测。0 表示不使用缓存。",
+        "h_arg_probe_top": "按预排序 (列表指标和历史记录) 先只检测主列表前 N 个节点，其余在需要时分批检测。0 表示一次检测全部。",
+        "h_arg_rank_weights": "预排序权重，如 'score=1,speed=1,ping=-1,uptime=0.5,sessions=-0.25,listed=0.5,stale=-1'。未给出的特征使用默认权重。",
         "h_arg_iptables": "设置 iptables 规则以阻止非 VPN 流量",
         "h_arg_probe_timeout": "探测时，等待连接的时间，超时后标记该 VPN 为不可用（以秒为单位）。",
         "h_arg_url": "VPN 列表的 URL（csv）。",
+        "h_arg_hedge_delay": "下载 VPN 列表时依次启动各来源的间隔 (秒, 0 表示同时请求)。",
         "h_arg_us": "将美国添加到可能的国家列表中. 等价于 --country US。",
         "h_arg_verbose": "输出更多详细信息。",
         "h_arg_vpn_timeout": "等待 VPN 建立连接的时间，超时后放弃（以秒为单位）。",
         "h_arg_vpn_timeout_poll_interval": "两次检查潜在超时的时间间隔（以秒为单位）。",
         "h_arg_ovpnfile": "连接到 OpenVPN 的 VPN，其配置文件为提供的 .ovpn 文件。",
         "h_arg_expired_time": "等待服务器列表过期的时间, 单位: 小时。",
+        "h_arg_stale_max_age": "过期但未超过该时长的服务器列表会立即使用，同时在后台更新, 单位: 小时 (0 表示总是等待下载)。",
         "h_arg_min_speed": "最低下载速度, 单位: MB/s。",
+        "h_arg_history_max_age": "保留历史列表中的服务器，直到其最后一次出现后超过该时长, 单位: 天 (0 表示只使用最新列表)。",
         "h_arg_qualified_time": "稳定连接一段时间后,保存服务器信息到收藏配置以供下次优先加载,单位: 分钟",
         "h_arg_sort_latency": "已开启延迟排序, 使用 \033[90m-ns\033[0m 关闭延迟排序",
         "h_arg_no_sort_latency": "关闭延迟排序",
-        "h_arg_udp_latency": "为 UDP 协议的 VPN 设置默认延迟（毫秒），用于排序",
+        "h_arg_udp_latency": "为无法探测的 UDP VPN (tls-auth/tls-crypt) 设置默认延迟（毫秒），用于排序",
         "h_arg_only_check_tiktok": "仅检测 TikTok 服务，忽略其他错误。",
         # 新增日志相关翻译
         "Missing OpenVPN config data.": "缺少 OpenVPN 配置数据。",
@@ -289,7 +321,6 @@ translations = {
         "Invalid Base64 config: %s": "无效的 Base64 配置: %s",
         "Could not determine IP, Port, or Protocol from config.": "无法从配置中确定 IP、端口或协议。",
         "New VPN: ip=%s, proto=%s port=%s country=%s (%s)": "新 VPN: ip=%s, 协议=%s 端口=%s 国家=%s (%s)",
-        "Cannot probe VPN without IP and Port.": "没有 IP 和端口无法探测 VPN。",
         "Failed to write config file %s: %s": "写入配置文件 %s 失败: %s",
         "VPN process did not initialize correctly.": "VPN 进程未正确初始化。",
         "Failed to set up firewall rules. Terminating connection.": "设置防火墙规则失败，终止连接。",
@@ -307,7 +338,6 @@ translations = {
         "VPN连接稳定，保存配置到文件\n %s。": "VPN 连接稳定，保存配置到文件\n %s。",
         "Failed to save qualified VPN info: %s": "保存优质 VPN 信息失败: %s",
         "Unexpected error saving qualified VPN: %s": "保存优质 VPN 时发生异常: %s",
-        "Already saved as qualified during this run.": "本次运行已保存为优质。",
         "VPN process already terminated or not started.": "VPN 进程已终止或未启动。",
         "Sent SIGTERM to PID %s.": "已发送 SIGTERM 到 PID %s。",
         "Process with PID %s not found for termination (already gone?).": "PID %s 进程未找到，可能已结束。",
@@ -334,24 +364,18 @@ translations = {
         "Including VPNs in Europe": "包含欧洲 VPN",
         "Including VPNs in USA": "包含美国 VPN",
         "Including VPNs in %s": "包含 %s 的 VPN",
-        "Found %s, but no VPNs were loaded from it.": "找到 %s，但未加载任何 VPN。",
         "Failed to read or process %s: %s": "读取或处理 %s 失败: %s",
-        "Error parsing row from qualified_vpns.csv: %s - %s": "解析 qualified_vpns.csv 行出错: %s - %s",
         "Failed to read or process main VPN list %s: %s": "读取或处理主 VPN 列表 %s 失败: %s",
-        "system proxy error: %s": "系统代理错误: %s",
+        "Error parsing row from main VPN list: %s - %s": "解析主 VPN 列表行出错: %s - %s",
+        "Configs directory not found: %s": "配置目录不存在: %s",
         "code: %s": "代码: %s",
         "I/O Error during monitoring: %s": "监控期间发生 IO 错误: %s",
         "An unexpected error occurred during vpn_monitor: %s": "vpn_monitor 期间发生异常: %s",
         "Qualified VPNs after responsiveness filter: %s": "延迟过滤后优质 VPN 数: %s",
         "Main list VPNs after responsiveness filter: %s": "延迟过滤后主列表 VPN 数: %s",
         "Connection attempt declined or failed for: %s": "连接尝试被拒绝或失败: %s",
-        "Attempting connections from %s list (%s VPNs)...": "尝试从 %s 列表连接 (%s 个 VPN)...",
-        "No VPNs to try in %s list.": "%s 列表中没有可用的 VPN。",
         "Connection established and confirmed with: %s": "已建立并确认连接: %s",
         "Connection process interrupted by user.": "连接过程被用户中断。",
-        "Skipping qualified VPN list as it is empty.": "跳过空的收藏 VPN 列表。",
-        "Skipping main VPN list as it is empty.": "跳过空的主 VPN 列表。",
-        "Connection already established from the qualified list. Skipping main list.": "已从收藏列表建立连接，跳过主列表。",
         "Failed to establish a connection with any VPN from any list.": "所有列表均未能建立 VPN 连接。",
         " during VPN wait.": "（VPN 等待期间）",
     },